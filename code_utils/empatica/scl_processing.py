@@ -4,10 +4,18 @@ Specifically, two pipelines are defined:
 1. The GSR processing pipeline (which cleans the GSR signal)
 2. The SCR processing pipeline (which decomposes the GSR signal into phasic and tonic
     components and finds the SCR peaks)
+
+The `fused_gsr_processing_pipeline` is a faster, numerically equivalent, variant of
+the GSR processing pipeline, which computes all its SQIs in a single kernel.
 """
 from __future__ import annotations
 
-from typing import List
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -23,10 +31,15 @@ from code_utils.empatica.generic_processing import (
     sqi_smoothen,
     threshold_sqi,
 )
-from code_utils.utils.dataframes import arr_to_repetitive_count
+from code_utils.utils.rle import RunLengthEncoding
+from code_utils.utils.rolling import rolling_mean, rolling_sum
+from code_utils.utils.shared_memory import from_shared_memory, to_shared_memory
 
 # CONFIG
 FS = 4  # the empatica GSR signal its sample frequency (Hz)
+# The version of the GSR stage its kernels, which is part of the GSR cache key.
+# Bump it whenever a kernel change alters the output, to invalidate the cache.
+_GSR_KERNEL_VERSION = 1
 
 
 # The GSR signal itself (artifacts)
@@ -105,33 +118,158 @@ if True:
     def interpolate_sqi(
         eda: pd.Series, valid: pd.Series, fs, output_name, max_interpolate_s=30
     ):
-        eda_cleaned: pd.Series = eda.rename(output_name)
-        eda_cleaned[~valid] = None
-
-        eda_cleaned = eda_cleaned.interpolate(
-            "time",
-            # "linear",
-            limit=max_interpolate_s * fs,
-            limit_area="inside",
-            limit_direction="forward",
+        valid = np.asarray(valid, dtype=bool)
+        rle = RunLengthEncoding.from_array(valid)
+
+        # Only the invalid runs which are short enough and enclosed by valid data
+        # are (time-based) linearly interpolated, all other invalid data is removed
+        short_gaps = rle.expand(
+            rle.select(False, max_length=max_interpolate_s * fs, enclosed=True)
         )
 
-        # remove the interpolations which end in the NaN regions
-        eda_cleaned[
-            ~valid & (arr_to_repetitive_count(valid) > max_interpolate_s * fs)
-        ] = None
-        return eda_cleaned
+        eda_cleaned = eda.values.copy()
+        eda_cleaned[~valid] = np.nan
+        if short_gaps.any():
+            t = eda.index.asi8
+            eda_cleaned[short_gaps] = np.interp(
+                t[short_gaps], t[valid], eda.values[valid]
+            )
+        return pd.Series(eda_cleaned, index=eda.index, name=output_name)
 
     def filter_duration(eda: pd.Series, fs, min_valid_len_s, output_name):
         min_n_samples = fs * min_valid_len_s
 
+        rle = RunLengthEncoding.from_array(eda.notna().values)
+        too_short = rle.expand(rle.select(True, max_length=np.ceil(min_n_samples) - 1))
+
         eda_filtered = eda.rename(output_name)
-        eda_notna = eda.notna()
-        eda_filtered[
-            eda_notna & (arr_to_repetitive_count(eda_notna) < min_n_samples)
-        ] = None
+        eda_filtered[too_short] = None
         return eda_filtered
 
+    def eda_quality_sqis(
+        eda: np.ndarray,
+        fs: int = FS,
+        f_cutoff: float = 1,
+        slope_max_increase: float = 0.25,
+        slope_max_decrease: float = 0.12,
+        noise_window_s: int = 5,
+        noise_precision: float = 0.03,
+        max_noise: float = 0.02,
+        lost_window_s: int = 5,
+        lost_min_sig_threshold: float = 0.05,
+        lost_min_ok_ratio: float = 0.9,
+        delta_noise_threshold: float = 0.3,
+        delta_min_threshold: float = 0.04,
+        delta_max_increase: float = 0.25,
+        delta_max_decrease: float = 0.1,
+        delta_window_s: int = 1,
+        smoothen_window_s: int = 5,
+        smoothen_min_ok_ratio: float = 0.6,
+    ) -> Dict[str, np.ndarray]:
+        """Fused, array-based, implementation of the EDA quality stage.
+
+        This kernel computes the same outputs as the `low_pass_filter`,
+        `slope_sqi`, `normalized_noise`, rolling abs-mean, `threshold_sqi`,
+        `lost_sqi`, `delta_sqi`, `sqi_and` and `sqi_smoothen` processors of the
+        `gsr_processing_pipeline`, but shares the intermediate results and avoids
+        the construction of (index-aligned) pandas Series.
+
+        Note
+        ----
+        The default argument values correspond to the `gsr_processing_pipeline`
+        its configuration.
+
+        Parameters
+        ----------
+        eda : np.ndarray
+            The (NaN-free) EDA signal, sampled at `fs` Hz.
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            A dict with keys the `gsr_processing_pipeline` its output names
+            (`EDA_lf_1Hz`, `slope`, `EDA_slope_SQI`, `noise`, `noise_mean_2s`,
+            `EDA_noise_SQI`, `EDA_lost_SQI`, `EDA_delta_SQI`, `EDA_SQI`,
+            `EDA_SQI_smoothend`) and values the corresponding arrays.
+
+        """
+        eda = np.asarray(eda)
+        assert not np.isnan(eda).any(), "eda should not contain any NaN values"
+
+        # EDA - filtering & slope SQI
+        b, a = signal.butter(
+            N=5, Wn=f_cutoff / (0.5 * fs), btype="lowpass", output="ba", fs=fs
+        )
+        eda_lf = signal.filtfilt(b=b, a=a, x=eda).astype(np.float32)
+        slope = np.full(len(eda_lf), np.nan, dtype=np.float32)
+        slope[:-1] = eda_lf[1:] / eda_lf[:-1]
+        slope_ok = (slope >= 1 - slope_max_decrease) & (slope <= 1 + slope_max_increase)
+
+        # EDA - noise processing
+        noise = (eda - eda_lf) / (eda_lf + noise_precision)
+        w_size = noise_window_s * fs
+        w_size += w_size % 2 - 1  # ensure that the window size is odd
+        noise_mean = rolling_mean(np.abs(noise), w_size, center=True)
+        noise_ok = noise_mean <= max_noise
+
+        # EDA - low sig values
+        w_size = lost_window_s * fs
+        w_size += w_size % 2 - 1
+        ok_sum = rolling_sum(eda >= lost_min_sig_threshold, w_size, center=True)
+        lost_ok = ok_sum >= w_size * lost_min_ok_ratio
+
+        # EDA - large delta's
+        eda_mean = rolling_mean(eda, fs * delta_window_s, center=True)
+        increase_threshold = np.maximum(
+            delta_min_threshold, eda_mean * delta_max_increase / fs
+        )
+        decrease_threshold = -np.maximum(
+            delta_min_threshold, eda_mean * delta_max_decrease / fs
+        )
+        delta = np.full(len(eda), np.nan)
+        delta[1:] = np.diff(eda)
+        low_noise = noise_mean <= delta_noise_threshold / 2
+        valid_decrease = (delta >= decrease_threshold) | (
+            (delta >= 2 * decrease_threshold) & low_noise
+        )
+        # a (6 * fs - 1) trailing-window min, shifted (3 * fs + 1) samples backwards
+        # note: the incomplete windows are considered as valid decreases
+        w_dec, shift = 6 * fs - 1, 3 * fs + 1
+        decrease_mask = np.ones(len(eda), dtype=bool)
+        n_ok = rolling_sum(valid_decrease, w_dec, center=False)[shift:]
+        decrease_mask[: len(n_ok)] = np.isnan(n_ok) | (n_ok == w_dec)
+        delta_ok = (
+            ((delta <= 0.5 * increase_threshold) & ~decrease_mask)
+            | ((delta <= increase_threshold) & decrease_mask)
+            | ((delta <= 2 * increase_threshold) & decrease_mask & low_noise)
+        ) & valid_decrease
+
+        # Calculate the total EDA SQI & smoothen it
+        sqi = lost_ok & delta_ok & noise_ok & slope_ok
+        w_size = smoothen_window_s * fs
+        sqi_sum = rolling_sum(sqi, w_size + (w_size % 2 - 1), center=True)
+        sqi_smoothend = sqi & ((sqi_sum / w_size) >= smoothen_min_ok_ratio)
+
+        return {
+            "EDA_lf_1Hz": eda_lf,
+            "slope": slope,
+            "EDA_slope_SQI": slope_ok,
+            "noise": noise,
+            "noise_mean_2s": noise_mean,
+            "EDA_noise_SQI": noise_ok,
+            "EDA_lost_SQI": lost_ok,
+            "EDA_delta_SQI": delta_ok,
+            "EDA_SQI": sqi,
+            "EDA_SQI_smoothend": sqi_smoothend,
+        }
+
+    def eda_quality(eda: pd.Series, fs: int = FS, **kwargs) -> List[pd.Series]:
+        """Wrap the `eda_quality_sqis` kernel its output into (named) Series."""
+        return [
+            pd.Series(arr, index=eda.index, name=name)
+            for name, arr in eda_quality_sqis(eda.values, fs=fs, **kwargs).items()
+        ]
+
 
 # GSR decomposition
 if True:
@@ -195,22 +333,110 @@ if True:
         assert min_rise_time_s < max_rise_time_s
         assert min_recovery_time_s < max_recovery_time_s
 
-        s_scr: pd.Series = df_scr["SCR_Peaks_scipy"].copy()  # not that loosely coupled
+        # a single (column-oriented) boolean filter
+        # note: a peak is only removed when a condition evaluates to True, i.e., NaN
+        # comparisons do not remove peaks
+        rise_time = df_scr["SCR_RiseTime"].values
+        recovery_time = df_scr["SCR_RecoveryTime"].values
+        s_scr: pd.Series = df_scr["SCR_Peaks_scipy"]
+        valid = (s_scr.notna().values & (s_scr.values != 0)) & ~(
+            (rise_time < min_rise_time_s)
+            | (rise_time > max_rise_time_s)
+            | (recovery_time < min_recovery_time_s)
+            | (recovery_time > max_recovery_time_s)
+            # additional acc & amplitude related processing
+            | (df_scr["SCR_Amplitude"].values < min_scr_amplitude)
+            | (df_scr["phasic_noise_ratio"].values < min_phasic_noise_ratio)
+        )
+        return s_scr[valid].rename(s_scr.name + "_reduced").to_frame()
+
+    def scr_rate(
+        scr_peaks: pd.Series,
+        window: Union[str, pd.Timedelta] = "1min",
+        step: Union[str, pd.Timedelta] = "1min",
+        t_start: Optional[pd.Timestamp] = None,
+        t_end: Optional[pd.Timestamp] = None,
+        output_name: str = "SCRR",
+    ) -> pd.Series:
+        """Calculate the skin conductance response rate (SCRR), in peaks per minute.
 
-        s_scr.loc[df_scr["SCR_RiseTime"] < min_rise_time_s] = 0
-        s_scr.loc[df_scr["SCR_RiseTime"] > max_rise_time_s] = 0
+        The number of peaks within each `(t - window, t]` window is obtained via a
+        binary search (`searchsorted`) over the sorted peak times, for every `t` on
+        a `step`-spaced grid.
 
-        s_scr.loc[df_scr["SCR_RecoveryTime"] < min_recovery_time_s] = 0
-        s_scr.loc[df_scr["SCR_RecoveryTime"] > max_recovery_time_s] = 0
+        Parameters
+        ----------
+        scr_peaks : pd.Series
+            The (time-indexed) SCR peaks, e.g., `SCR_Peaks_scipy_reduced`. Only the
+            non-NaN and non-zero values are considered as peaks.
+        window : Union[str, pd.Timedelta], optional
+            The window size, by default "1min".
+        step : Union[str, pd.Timedelta], optional
+            The step size of the output grid, by default "1min".
+        t_start : pd.Timestamp, optional
+            The start of the output grid, by default None (i.e., the first peak its
+            timestamp, floored to `step`).
+        t_end : pd.Timestamp, optional
+            The end of the output grid, by default None (i.e., the last peak its
+            timestamp).
+        output_name : str, optional
+            The name of the output series, by default "SCRR".
 
-        # additional acc & amplitude related processing
-        s_scr.loc[df_scr["SCR_Amplitude"] < min_scr_amplitude] = 0
-        s_scr.loc[df_scr["phasic_noise_ratio"] < min_phasic_noise_ratio] = 0
+        Returns
+        -------
+        pd.Series
+            The SCR rate, indexed by the window its end time.
 
-        return s_scr[s_scr != 0].rename(s_scr.name + "_reduced").to_frame()
+        """
+        window, step = pd.Timedelta(window), pd.Timedelta(step)
+        peaks = scr_peaks[scr_peaks.notna() & (scr_peaks != 0)].index
+        if not peaks.is_monotonic_increasing:
+            peaks = peaks.sort_values()
+        if t_start is None or t_end is None:
+            if not len(peaks):
+                return pd.Series(dtype=float, name=output_name)
+            t_start = peaks[0].floor(step) if t_start is None else t_start
+            t_end = peaks[-1] if t_end is None else t_end
+
+        grid = pd.date_range(t_start, t_end, freq=step)
+        n_peaks = peaks.searchsorted(grid, side="right") - peaks.searchsorted(
+            grid - window, side="right"
+        )
+        return pd.Series(
+            n_peaks / (window / pd.Timedelta(minutes=1)), index=grid, name=output_name
+        )
 
 
 # -------------------------- The processing pipelines ---------------------------------
+# The processors which interpolate and filter the EDA signal, based on its
+# smoothened SQI
+_gsr_cleaning_processors = [
+    # Interpolate the SQI
+    SeriesProcessor(
+        interpolate_sqi,
+        tuple(["EDA", "EDA_SQI_smoothend"]),
+        fs=FS,
+        max_interpolate_s=5,
+        output_name="raw_cleaned",
+    ),
+    # Remove to short sessions
+    SeriesProcessor(
+        filter_duration,
+        "raw_cleaned",
+        output_name="raw_cleaned_duration_filter",
+        fs=FS,
+        min_valid_len_s=60,
+    ),
+    SeriesProcessor(
+        nan_padded_low_pass_filter,
+        "raw_cleaned_duration_filter",
+        fs=FS,
+        f_cutoff=1,
+        nan_pad_size_s=1,
+        output_name="EDA_lf_cleaned",
+    ),
+]
+
 gsr_processing_pipeline = SeriesPipeline(
     processors=[
         # EDA - filtering & slope SQI
@@ -280,170 +506,623 @@ gsr_processing_pipeline = SeriesPipeline(
             center=True,
             min_ok_ratio=0.6,
         ),
-        # Interpolate the SQI
-        SeriesProcessor(
-            interpolate_sqi,
-            tuple(["EDA", "EDA_SQI_smoothend"]),
-            fs=FS,
-            max_interpolate_s=5,
-            output_name="raw_cleaned",
-        ),
-        # Remove to short sessions
-        SeriesProcessor(
-            filter_duration,
-            "raw_cleaned",
-            output_name="raw_cleaned_duration_filter",
-            fs=FS,
-            min_valid_len_s=60,
-        ),
-        SeriesProcessor(
-            nan_padded_low_pass_filter,
-            "raw_cleaned_duration_filter",
-            fs=FS,
-            f_cutoff=1,
-            nan_pad_size_s=1,
-            output_name="EDA_lf_cleaned",
-        ),
+        *_gsr_cleaning_processors,
     ]
 )
 
-scr_processing_pipeline = SeriesPipeline(
+# A fused variant of the `gsr_processing_pipeline`, which computes the quality
+# stage (i.e., all SQIs up to `EDA_SQI_smoothend`) in a single array-based kernel
+fused_gsr_processing_pipeline = SeriesPipeline(
     processors=[
-        # Try to estimate the tonic component of the EDA
-        SeriesProcessor(
-            tonic_eda, "EDA_lf_cleaned", fs=FS, smoothen_window_s=45, q=0.025
-        ),
-        SeriesProcessor(
-            nan_padded_low_pass_filter,
-            "EDA_lf_cleaned_tonic",
-            fs=FS,
-            f_cutoff=0.05,
-            nan_pad_size_s=1,
-            output_name="EDA_lf_cleaned_tonic_lf",
-        ),
-        # Decompose into a tonic and phasic component & find peaks
-        SeriesProcessor(
-            phasic,
-            tuple(["EDA_lf_cleaned", "EDA_lf_cleaned_tonic_lf", "noise_mean_2s"]),
-            noise_factor=0,
-        ),
-        SeriesProcessor(tonic_eda, "EDA_Phasic", fs=FS, smoothen_window_s=10, q=0.05),
-        SeriesProcessor(
-            nan_padded_low_pass_filter,
-            "EDA_Phasic_tonic",
-            f_cutoff=0.1,
-            nan_pad_size_s=1,
-            fs=FS,
-            output_name="EDA_Phasic_tonic_lf",
-        ),
-        SeriesProcessor(
-            lambda noise_rms, eda_tonic, eda_phasic, eda_phasic_tonic: (
-                (
-                    # note, we do not want to center the meen, we want to
-                    # calculate this on the prior values
-                    (eda_phasic - eda_phasic_tonic)
-                    .fillna(0)
-                    .rolling(5 * FS, center=True)
-                    .mean()
-                    / (noise_rms.clip(lower=0.002) * eda_tonic.clip(lower=0.5))
-                ).clip(lower=0, upper=20)
-            ).rename("phasic_noise_ratio"),
-            series_names=tuple(
-                [
-                    "noise_mean_2s",
-                    "EDA_lf_cleaned_tonic",
-                    "EDA_Phasic",
-                    "EDA_Phasic_tonic_lf",
-                ]
-            ),
-        ),
-        # Find the peaks
-        SeriesProcessor(
-            find_peaks_scipy,
-            "EDA_Phasic",
-            fs=FS,
-            distance=FS,
-            rel_height=0.1,
-            prominence=0.02,
-            wlen=FS * 60,
+        SeriesProcessor(eda_quality, "EDA", fs=FS),
+        *_gsr_cleaning_processors,
+    ]
+)
+
+# The processors which decompose the cleaned EDA into a tonic and phasic component
+_scr_decomposition_processors = [
+    # Try to estimate the tonic component of the EDA
+    SeriesProcessor(tonic_eda, "EDA_lf_cleaned", fs=FS, smoothen_window_s=45, q=0.025),
+    SeriesProcessor(
+        nan_padded_low_pass_filter,
+        "EDA_lf_cleaned_tonic",
+        fs=FS,
+        f_cutoff=0.05,
+        nan_pad_size_s=1,
+        output_name="EDA_lf_cleaned_tonic_lf",
+    ),
+    # Decompose into a tonic and phasic component & find peaks
+    SeriesProcessor(
+        phasic,
+        tuple(["EDA_lf_cleaned", "EDA_lf_cleaned_tonic_lf", "noise_mean_2s"]),
+        noise_factor=0,
+    ),
+    SeriesProcessor(tonic_eda, "EDA_Phasic", fs=FS, smoothen_window_s=10, q=0.05),
+    SeriesProcessor(
+        nan_padded_low_pass_filter,
+        "EDA_Phasic_tonic",
+        f_cutoff=0.1,
+        nan_pad_size_s=1,
+        fs=FS,
+        output_name="EDA_Phasic_tonic_lf",
+    ),
+    SeriesProcessor(
+        lambda noise_rms, eda_tonic, eda_phasic, eda_phasic_tonic: (
+            (
+                # note, we do not want to center the meen, we want to
+                # calculate this on the prior values
+                (eda_phasic - eda_phasic_tonic)
+                .fillna(0)
+                .rolling(5 * FS, center=True)
+                .mean()
+                / (noise_rms.clip(lower=0.002) * eda_tonic.clip(lower=0.5))
+            ).clip(lower=0, upper=20)
+        ).rename("phasic_noise_ratio"),
+        series_names=tuple(
+            [
+                "noise_mean_2s",
+                "EDA_lf_cleaned_tonic",
+                "EDA_Phasic",
+                "EDA_Phasic_tonic_lf",
+            ]
         ),
-        # Filter the peaks
-        SeriesProcessor(
-            remove_false_positives,
-            tuple(
-                [
-                    "SCR_RiseTime",
-                    "SCR_Peaks_scipy",
-                    "SCR_RecoveryTime",
-                    "SCR_Amplitude",
-                    "phasic_noise_ratio",
-                ]
-            ),
-            min_rise_time_s=0.5,
-            min_recovery_time_s=0.5,
-            max_rise_time_s=100,
-            max_recovery_time_s=100,
-            # a tradeoff between these two
-            min_scr_amplitude=0.03,
-            min_phasic_noise_ratio=7.5,
+    ),
+]
+
+# The processors which detect (and filter) the SCR peaks in the phasic component
+_scr_peak_processors = [
+    # Find the peaks
+    SeriesProcessor(
+        find_peaks_scipy,
+        "EDA_Phasic",
+        fs=FS,
+        distance=FS,
+        rel_height=0.1,
+        prominence=0.02,
+        wlen=FS * 60,
+    ),
+    # Filter the peaks
+    SeriesProcessor(
+        remove_false_positives,
+        tuple(
+            [
+                "SCR_RiseTime",
+                "SCR_Peaks_scipy",
+                "SCR_RecoveryTime",
+                "SCR_Amplitude",
+                "phasic_noise_ratio",
+            ]
         ),
-        # Derive the skin conductance response rate (SCRR)
-        # SeriesProcessor(
-        #     lambda x: x.rolling("1min").count().rename('SCRR'),
-        #     tuple(["EDA", "SCR_Peaks_scipy_reduced"])
-        # )
+        min_rise_time_s=0.5,
+        min_recovery_time_s=0.5,
+        max_rise_time_s=100,
+        max_recovery_time_s=100,
+        # a tradeoff between these two
+        min_scr_amplitude=0.03,
+        min_phasic_noise_ratio=7.5,
+    ),
+]
+
+scr_decomposition_pipeline = SeriesPipeline(processors=_scr_decomposition_processors)
+scr_peak_pipeline = SeriesPipeline(processors=_scr_peak_processors)
+
+scr_processing_pipeline = SeriesPipeline(
+    processors=[
+        *_scr_decomposition_processors,
+        *_scr_peak_processors,
+        # Note: the skin conductance response rate (SCRR) can be derived from the
+        # `SCR_Peaks_scipy_reduced` output via `scr_rate`
     ]
 )
 
 
 # ------------------------- PIPELINES WRAPPERS
-def process_gsr_pipeline(
-    df_scl: pd.Series, use_scr_pipeline=True, n_jobs=1
+def _is_serial(n_jobs) -> bool:
+    return isinstance(n_jobs, int) and n_jobs <= 1
+
+
+def _gsr_pipeline_name(use_scr_pipeline: bool, fused: bool) -> str:
+    # note: the SCR peaks are detected afterwards, see `_detect_scr_peaks`
+    name = "fused_gsr" if fused else "gsr"
+    return name + "+scr_decomposition" if use_scr_pipeline else name
+
+
+def _named_pipeline(name: str) -> SeriesPipeline:
+    """Return the pipeline which is composed of the "+"-separated module pipelines.
+
+    As the pipelines hold (unpicklable) lambdas, the process workers receive the
+    pipeline its name instead of the pipeline itself.
+    """
+    pipelines = {
+        # the fused pipeline yields the same output as the `gsr_processing_pipeline`
+        "fused_gsr": fused_gsr_processing_pipeline,
+        "gsr": gsr_processing_pipeline,
+        "scr_decomposition": scr_decomposition_pipeline,
+        "scr_peak": scr_peak_pipeline,
+    }
+    return SeriesPipeline([pipelines[n] for n in name.split("+")])
+
+
+def _get_gsr_pipeline(use_scr_pipeline: bool, fused: bool) -> SeriesPipeline:
+    return _named_pipeline(_gsr_pipeline_name(use_scr_pipeline, fused))
+
+
+def _process_shared_chunk(
+    shm_name: str,
+    layout: Dict[str, tuple],
+    start: int,
+    stop: int,
+    series_names: List[str],
+    tz,
+    pipeline_name: str,
+) -> Tuple[str, Dict[str, tuple]]:
+    """Process the `[start, stop)` chunk of the shared (same-indexed) series.
+
+    This function is executed in a worker process. The chunk its series are read
+    from the shared memory block `shm_name` and the processed output is written to
+    a newly created shared memory block, of which the name and layout are returned.
+    """
+    shm = SharedMemory(name=shm_name)
+    try:
+        arrays = from_shared_memory(shm, layout, copy=False)
+        index = pd.DatetimeIndex(arrays["__index__"][start:stop].copy(), tz="UTC")
+        index = index.tz_convert(tz) if tz is not None else index.tz_localize(None)
+        series = [
+            pd.Series(arrays[name][start:stop].copy(), index=index, name=name)
+            for name in series_names
+        ]
+        del arrays
+    finally:
+        shm.close()
+
+    df_chunk = _named_pipeline(pipeline_name).process(
+        series, return_all_series=False, return_df=True
+    )
+    out_arrays = {"__index__": df_chunk.index.asi8}
+    out_arrays.update({c: df_chunk[c].values for c in df_chunk.columns})
+    out_shm, out_layout = to_shared_memory(out_arrays)
+    out_shm.close()
+    return out_shm.name, out_layout
+
+
+def _unlink_shared_memory(shm_name: str):
+    try:
+        shm = SharedMemory(name=shm_name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _process_chunks_multiprocessing(
+    chunks: List[List[pd.Series]], pipeline_name: str, n_jobs=None
+) -> List[pd.DataFrame]:
+    """Process the chunks in a process pool, using shared memory to exchange data.
+
+    All chunks (whose series must share their index) are written once to a single
+    shared memory block, after which only their offsets are sent to the workers.
+    The workers return their output through shared memory as well, avoiding the
+    pickling of (large) DataFrames.
+    """
+    series_names = [s.name for s in chunks[0]]
+    tz = chunks[0][0].index.tz
+    index_name = chunks[0][0].index.name
+    offsets = np.cumsum([0] + [len(chunk[0]) for chunk in chunks])
+    arrays = {"__index__": np.concatenate([chunk[0].index.asi8 for chunk in chunks])}
+    for i, name in enumerate(series_names):
+        arrays[name] = np.concatenate([chunk[i].values for chunk in chunks])
+    shm, layout = to_shared_memory(arrays)
+    del arrays
+
+    out_blocks: List[Optional[Tuple[str, Dict[str, tuple]]]] = []
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(
+                    _process_shared_chunk,
+                    shm.name,
+                    layout,
+                    offsets[i],
+                    offsets[i + 1],
+                    series_names,
+                    tz,
+                    pipeline_name,
+                )
+                for i in range(len(chunks))
+            ]
+        # note: leaving the executor context waits for all futures, hence, all the
+        # output blocks are known (and released) even if a chunk its processing failed
+        out_blocks = [f.result() if f.exception() is None else None for f in futures]
+        for future in futures:
+            future.result()  # raises the (first) worker exception
+
+        df_list = []
+        for out_name, out_layout in out_blocks:
+            out_shm = SharedMemory(name=out_name)
+            try:
+                out = from_shared_memory(out_shm, out_layout, copy=True)
+            finally:
+                out_shm.close()
+            index = pd.DatetimeIndex(out.pop("__index__"), tz="UTC")
+            index = index.tz_convert(tz) if tz is not None else index.tz_localize(None)
+            df_list.append(pd.DataFrame(out, index=index.rename(index_name)))
+        return df_list
+    finally:
+        shm.close()
+        shm.unlink()
+        for block in out_blocks:
+            if block is not None:
+                _unlink_shared_memory(block[0])
+
+
+def _chunk_core_ranges(
+    chunks: List[List[pd.Series]],
+) -> List[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]]:
+    """Return the `[start, end)` core range of each (time-ordered) chunk.
+
+    The boundary between two overlapping chunks is placed in the middle of their
+    overlap, i.e., each sample is assigned to the chunk which has the most context
+    around it. A `None` bound indicates that the chunk does not overlap with its
+    neighbor at that side.
+    """
+    bounds = [(c[0].index[0], c[0].index[-1]) for c in chunks]
+    cores = []
+    for i, (start, end) in enumerate(bounds):
+        core_start = core_end = None
+        if i > 0 and bounds[i - 1][1] >= start:
+            core_start = start + (bounds[i - 1][1] - start) / 2
+        if i < len(bounds) - 1 and bounds[i + 1][0] <= end:
+            core_end = bounds[i + 1][0] + (end - bounds[i + 1][0]) / 2
+        cores.append((core_start, core_end))
+    return cores
+
+
+def _stitch_chunks(
+    df_list: List[pd.DataFrame],
+    cores: List[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]],
 ) -> pd.DataFrame:
-    if use_scr_pipeline:
-        tot_pipeline = SeriesPipeline(
-            [gsr_processing_pipeline, scr_processing_pipeline]
-        )
-    else:
-        tot_pipeline = SeriesPipeline([gsr_processing_pipeline])
+    """Trim each chunk its output to its core range and concatenate the outputs."""
+    trimmed = []
+    for df_chunk, (core_start, core_end) in zip(df_list, cores):
+        if not len(df_chunk):
+            continue
+        start_idx, end_idx = 0, len(df_chunk)
+        if core_start is not None:
+            start_idx = df_chunk.index.searchsorted(core_start, side="left")
+        if core_end is not None:
+            end_idx = df_chunk.index.searchsorted(core_end, side="left")
+        trimmed.append(df_chunk.iloc[start_idx:end_idx])
+    return pd.concat(trimmed) if len(trimmed) else pd.DataFrame()
+
 
+def _chunk_eda_data(
+    series_list: List[pd.Series],
+    max_chunk_dur: Optional[pd.Timedelta],
+    chunk_overlap: pd.Timedelta,
+) -> List[List[pd.Series]]:
+    """Chunk the (same-indexed) series into time-ordered, gap-free, chunks."""
     chunks = chunk_data(
         # only process a sub-chunk of the data dict
-        data=[df_scl],
-        fs_dict={"EDA": FS},
+        data=series_list,
+        fs_dict={s.name: FS for s in series_list},
         chunk_range_margin=pd.Timedelta(seconds=10),
         min_chunk_dur=pd.Timedelta(seconds=60 * 5),
-        # max_chunk_dur=pd.Timedelta(seconds=60 * 180),
-        # sub_chunk_overlap=pd.Timedelta(seconds=10),
+        max_chunk_dur=max_chunk_dur,
+        sub_chunk_overlap=chunk_overlap if max_chunk_dur is not None else None,
         verbose=False,
         copy=False,
     )
-    if isinstance(n_jobs, int) and n_jobs <= 1:
-        df_processed = pd.concat(
-            [
-                tot_pipeline.process(chunk, return_all_series=False, return_df=True)
-                for chunk in chunks
-            ]
+    return sorted(chunks, key=lambda c: c[0].index[0])
+
+
+def _step_params(step: SeriesProcessor) -> Dict[str, object]:
+    """Return the effective keyword arguments (i.e., incl. the defaults) of a step."""
+    # the eda_quality wrapper forwards its kwargs to the fused kernel
+    func = eda_quality_sqis if step.function is eda_quality else step.function
+    defaults = {
+        k: p.default
+        for k, p in inspect.signature(func).parameters.items()
+        if p.default is not inspect.Parameter.empty
+    }
+    return {**defaults, **step.kwargs}
+
+
+def _gsr_cache_key(df_scl: pd.Series, pipeline: SeriesPipeline, **params) -> str:
+    """Return a hash of the EDA signal and the GSR stage its configuration.
+
+    The configuration consists of the kernel version, the pipeline (i.e., its
+    steps and their series) and the effective parameters of each step.
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(df_scl.index.asi8).tobytes())
+    h.update(np.ascontiguousarray(df_scl.values).tobytes())
+    h.update(str(df_scl.index.tz).encode())
+    h.update(f"v{_GSR_KERNEL_VERSION}".encode())
+    h.update(str(pipeline).encode())
+    for step in pipeline.processing_steps:
+        h.update(str(sorted(_step_params(step).items())).encode())
+    h.update(str(sorted(params.items())).encode())
+    return h.hexdigest()
+
+
+def _process_chunks(
+    chunks: List[List[pd.Series]],
+    pipeline: SeriesPipeline,
+    n_jobs=1,
+    backend: str = "thread",
+    pipeline_name: Optional[str] = None,
+) -> List[pd.DataFrame]:
+    """Process the chunks serially, with tsflex its multithreaded processing or with
+    a (shared memory) process pool.
+
+    The process backend requires the `pipeline_name` (see `_named_pipeline`) and
+    same-indexed chunk series; otherwise, the chunks are processed by threads.
+    """
+    if _is_serial(n_jobs) or not len(chunks):
+        return [
+            pipeline.process(chunk, return_all_series=False, return_df=True)
+            for chunk in chunks
+        ]
+    if (
+        backend == "process"
+        and pipeline_name is not None
+        and all(s.index.equals(chunk[0].index) for chunk in chunks for s in chunk[1:])
+    ):
+        return _process_chunks_multiprocessing(chunks, pipeline_name, n_jobs=n_jobs)
+    return process_chunks_multithreaded(
+        same_range_chunks_list=chunks,
+        series_pipeline=pipeline,
+        n_jobs=n_jobs,
+        show_progress=False,
+        return_all_series=False,
+        return_df=True,
+    )
+
+
+def _detect_scr_peaks(
+    df_scr: pd.DataFrame,
+    chunks: List[List[pd.Series]],
+    peak_pipeline: SeriesPipeline,
+    peak_context: pd.Timedelta,
+    n_jobs=1,
+    backend: str = "thread",
+    peak_pipeline_name: Optional[str] = None,
+) -> pd.DataFrame:
+    """Detect the SCR peaks on the stitched output of the SCR decomposition stage.
+
+    Each chunk its core range is extended with `peak_context` at both sides (within
+    the chunk its gap-free segment), so that the peak detection (i.e., the
+    `find_peaks` prominence window and bases) has the same context as a run on the
+    whole segment. Only the peaks which lie within the chunk core are retained, and
+    the (time-ordered) peak tables are concatenated.
+
+    Note
+    ----
+    When the chunks are whole gap-free segments (i.e., no `max_chunk_dur`), the
+    resulting peak table is exactly that of a serial, whole-segment, run. When the
+    segments are split into sub-chunks, the peak detection itself still has full
+    context, but its input (i.e., the stitched `EDA_Phasic` and
+    `phasic_noise_ratio`) slightly differs, see `process_gsr_pipeline`.
+    """
+    cores = _chunk_core_ranges(chunks)
+    bounds = [(c[0].index[0], c[0].index[-1]) for c in chunks]
+
+    # the gap-free segment of a chunk spans all the chunks that (transitively)
+    # overlap with it
+    seg_starts, seg_ends = [b[0] for b in bounds], [b[1] for b in bounds]
+    for i in range(1, len(chunks)):
+        if cores[i][0] is not None:
+            seg_starts[i] = seg_starts[i - 1]
+    for i in range(len(chunks) - 2, -1, -1):
+        if cores[i][1] is not None:
+            seg_ends[i] = seg_ends[i + 1]
+
+    index = df_scr.index
+    peak_chunks = []
+    for (core_start, core_end), (start, end), seg_start, seg_end in zip(
+        cores, bounds, seg_starts, seg_ends
+    ):
+        t_start = max(seg_start, (core_start or start) - peak_context)
+        t_end = min(seg_end, (core_end or end) + peak_context)
+        slc = slice(
+            index.searchsorted(t_start, side="left"),
+            index.searchsorted(t_end, side="right"),
+        )
+        peak_chunks.append(
+            [df_scr["EDA_Phasic"].iloc[slc], df_scr["phasic_noise_ratio"].iloc[slc]]
         )
-    else:
-        df_processed = pd.concat(
-            process_chunks_multithreaded(
-                same_range_chunks_list=chunks,
-                series_pipeline=tot_pipeline,
-                n_jobs=n_jobs,
-                show_progress=False,
-                return_all_series=False,
-                return_df=True,
+    df_list = _process_chunks(
+        peak_chunks, peak_pipeline, n_jobs, backend, pipeline_name=peak_pipeline_name
+    )
+    return _stitch_chunks(df_list, cores)
+
+
+def process_scr_pipeline(
+    df_gsr: pd.DataFrame,
+    decomposition_pipeline: Optional[SeriesPipeline] = None,
+    peak_pipeline: Optional[SeriesPipeline] = None,
+    n_jobs=1,
+    backend: str = "thread",
+    max_chunk_dur: Optional[pd.Timedelta] = None,
+    chunk_overlap: pd.Timedelta = pd.Timedelta(minutes=10),
+    peak_context: pd.Timedelta = pd.Timedelta(seconds=60),
+) -> pd.DataFrame:
+    """Process the output of the GSR stage with the SCR processing pipeline.
+
+    This allows to (re)run the SCR stage, e.g., when tuning its peak detection
+    parameters, without recomputing the GSR stage.
+
+    Parameters
+    ----------
+    df_gsr : pd.DataFrame
+        The output of `process_gsr_pipeline(use_scr_pipeline=False)`, must contain
+        the `EDA_lf_cleaned` and `noise_mean_2s` columns.
+    decomposition_pipeline : SeriesPipeline, optional
+        The pipeline which decomposes the cleaned EDA into a tonic and phasic
+        component, by default None (i.e., the `scr_decomposition_pipeline`).
+    peak_pipeline : SeriesPipeline, optional
+        The pipeline which detects the SCR peaks in the phasic component, by
+        default None (i.e., the `scr_peak_pipeline`).
+    n_jobs : int, optional
+        The number of parallel workers, by default 1. See `process_gsr_pipeline`,
+        the output does not depend on `n_jobs`.
+    backend : str, optional
+        Either "thread" or "process", see `process_gsr_pipeline`, by default
+        "thread". Note: custom (i.e., passed) pipelines are always processed by
+        threads, as they cannot be sent to the worker processes.
+    max_chunk_dur : pd.Timedelta, optional
+        The maximal duration of a chunk, by default None. See
+        `process_gsr_pipeline`, passing a duration alters the output.
+    chunk_overlap : pd.Timedelta, optional
+        The overlap between consecutive sub-chunks, see `process_gsr_pipeline`.
+    peak_context : pd.Timedelta, optional
+        The context which is added at both sides of a chunk its core range when
+        detecting peaks, by default 60 seconds. This should be at least half of
+        the `find_peaks` its `wlen` (i.e., the prominence window).
+
+    Returns
+    -------
+    pd.DataFrame
+        The SCR stage its output.
+
+    """
+    assert backend in ["process", "thread"]
+    chunks = _chunk_eda_data(
+        [df_gsr["EDA_lf_cleaned"], df_gsr["noise_mean_2s"]],
+        max_chunk_dur=max_chunk_dur,
+        chunk_overlap=chunk_overlap,
+    )
+    df_list = _process_chunks(
+        chunks,
+        decomposition_pipeline or scr_decomposition_pipeline,
+        n_jobs,
+        backend,
+        pipeline_name=None if decomposition_pipeline else "scr_decomposition",
+    )
+    df_scr = _stitch_chunks(df_list, _chunk_core_ranges(chunks))
+    df_peaks = _detect_scr_peaks(
+        df_scr,
+        chunks,
+        peak_pipeline or scr_peak_pipeline,
+        peak_context,
+        n_jobs,
+        backend,
+        peak_pipeline_name=None if peak_pipeline else "scr_peak",
+    )
+    return pd.concat([df_scr, df_peaks], axis=1)
+
+
+def process_gsr_pipeline(
+    df_scl: pd.Series,
+    use_scr_pipeline=True,
+    n_jobs=1,
+    fused=True,
+    backend="thread",
+    max_chunk_dur: Optional[pd.Timedelta] = None,
+    chunk_overlap: pd.Timedelta = pd.Timedelta(minutes=10),
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> pd.DataFrame:
+    """Process the EDA signal with the GSR (and SCR) processing pipeline.
+
+    Parameters
+    ----------
+    df_scl : pd.Series
+        The (4 Hz, time-indexed) EDA signal, named "EDA".
+    use_scr_pipeline : bool, optional
+        Whether the `scr_processing_pipeline` is also applied, by default True.
+    n_jobs : int, optional
+        The number of parallel workers, by default 1 (i.e., no parallelization).
+        If None, all available cores are used. The gap-free segments of the signal
+        are processed in parallel, hence the output is the same for any `n_jobs`
+        and `backend`. Note that a single gap-free recording is not parallelized,
+        unless it is split via `max_chunk_dur`.
+    fused : bool, optional
+        Whether the `fused_gsr_processing_pipeline` is used instead of the
+        `gsr_processing_pipeline`, by default True.
+    backend : str, optional
+        Either "thread" (tsflex its multithreaded chunk processing) or "process"
+        (a process pool with shared memory chunks, opt-in), by default "thread".
+        Only used when `n_jobs` != 1; both the GSR and the SCR stage are
+        parallelized with this backend.
+    max_chunk_dur : pd.Timedelta, optional
+        The maximal duration of a chunk, by default None, i.e., each gap-free
+        segment is processed as a whole. If set (opt-in), long gap-free segments
+        are split into overlapping sub-chunks, which allows to parallelize a single
+        long recording. This alters the output: the (IIR) low-pass filters and the
+        rolling windows of a sub-chunk only see its own context, which results in
+        (small) differences in the filtered signals, e.g., up to ~5e-5 in
+        `EDA_Phasic` for 2 hour chunks of a 24 hour recording. These are amplified
+        in the `phasic_noise_ratio` (up to ~4e-3), hence, peaks whose ratio lies
+        close to the `min_phasic_noise_ratio` threshold may differ.
+    chunk_overlap : pd.Timedelta, optional
+        The overlap between consecutive sub-chunks, by default 10 minutes. The
+        output of each sub-chunk is trimmed to its core range (i.e., half of the
+        overlap is removed at each side), so that the values near chunk edges stem
+        from the chunk with the most context.
+    cache_dir : Union[str, Path], optional
+        If passed, the GSR stage its output is cached in this directory (as a
+        parquet file, keyed by a hash of `df_scl` and the GSR stage its
+        configuration). The SCR stage is then (re)computed on the cached output via
+        `process_scr_pipeline`. By default None, i.e., no caching.
+
+    Returns
+    -------
+    pd.DataFrame
+        The processed output.
+
+    """
+    assert backend in ["process", "thread"]
+    chunk_kwargs = dict(max_chunk_dur=max_chunk_dur, chunk_overlap=chunk_overlap)
+
+    if not df_scl.index.is_unique:
+        df_scl = df_scl[~df_scl.index.duplicated(keep="first")]
+
+    if cache_dir is not None:
+        cache_path = Path(cache_dir) / (
+            "gsr_"
+            + _gsr_cache_key(df_scl, _get_gsr_pipeline(False, fused), **chunk_kwargs)
+            + ".parquet"
+        )
+        if cache_path.exists():
+            df_gsr = pd.read_parquet(cache_path, engine="pyarrow")
+        else:
+            df_gsr = process_gsr_pipeline(
+                df_scl, False, n_jobs, fused, backend, **chunk_kwargs
             )
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            df_gsr.to_parquet(cache_path, engine="pyarrow")
+
+        if not use_scr_pipeline:
+            return df_gsr
+        df_scr = process_scr_pipeline(
+            df_gsr, n_jobs=n_jobs, backend=backend, **chunk_kwargs
         )
+        return pd.concat([df_gsr, df_scr], axis=1)
 
-    df_processed = (
-        df_processed.reset_index()
-        .drop_duplicates(subset="timestamp", keep="first")
-        .set_index("timestamp", drop=True)
-        .sort_index()
+    chunks = _chunk_eda_data([df_scl], **chunk_kwargs)
+    df_list = _process_chunks(
+        chunks,
+        _get_gsr_pipeline(use_scr_pipeline, fused),
+        n_jobs,
+        backend,
+        pipeline_name=_gsr_pipeline_name(use_scr_pipeline, fused),
     )
 
+    # the chunks are time-ordered, hence, trimming them to their core range results
+    # in a sorted and duplicate-free output
+    df_processed = _stitch_chunks(df_list, _chunk_core_ranges(chunks))
+    if use_scr_pipeline:
+        df_peaks = _detect_scr_peaks(
+            df_processed,
+            chunks,
+            scr_peak_pipeline,
+            peak_context=pd.Timedelta(seconds=60),
+            n_jobs=n_jobs,
+            backend=backend,
+            peak_pipeline_name="scr_peak",
+        )
+        df_processed = pd.concat([df_processed, df_peaks], axis=1)
+
     # df_logs = get_processor_logs("gsr_processing.log")
     # df_logs["duration %"] = 100 * df_logs["duration"] / df_logs["duration"].sum()
     # print("-" * 80)
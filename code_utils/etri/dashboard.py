@@ -1,21 +1,14 @@
 """Code to generate time-series visualization dashboard for the ETRI data."""
 
 import sys
-from datetime import datetime
 from inspect import getsourcefile
 from pathlib import Path
 from typing import List, Tuple
 
 import dash
 import dash_bootstrap_components as dbc
-import pandas as pd
 import plotly.graph_objs as go
 from dash.dependencies import Input, Output, State
-from dash_extensions.enrich import (
-    DashProxy,
-    ServersideOutput,
-    ServersideOutputTransform,
-)
 from plotly.subplots import make_subplots
 from plotly_resampler import FigureResampler
 from plotly_resampler.aggregation import MinMaxLTTB
@@ -23,21 +16,15 @@ from plotly_resampler.aggregation import MinMaxLTTB
 # fmt: off
 # isort: off
 sys.path.append(str(Path(getsourcefile(lambda: 0)).parent.parent.parent.absolute()))
+from code_utils.etri.label_parsing import load_user_labels  # noqa: E402
 from code_utils.etri.visualization import add_etri_timeline_to_fig  # noqa: E402
 from code_utils.path_conf import processed_etri_path  # noqa: E402
-from code_utils.utils.dash_utils import serve_layout, get_selector_states, _create_subfolder_dict # noqa: E402
+from code_utils.utils.dash_utils import serve_layout, get_selector_states, load_sensor_data, figure_store # noqa: E402
 # isort: on
 # fmt: on
 
-# read the label file, which stems from the parsed ETRI notebook
-df_labels = pd.read_parquet(processed_etri_path / "labels.parquet")
-
 # create the Dash app
-app = DashProxy(
-    __name__,
-    external_stylesheets=[dbc.themes.LUX],
-    transforms=[ServersideOutputTransform()],
-)
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.LUX])
 
 
 # each list is a type
@@ -55,6 +42,11 @@ app.layout = serve_layout(
 )
 selector_states = get_selector_states(name_folders_list)
 
+# The minimal number of points per sensor; for longer ranges, the coarsest
+# precomputed pyramid level which still meets this budget is loaded instead of the
+# raw data (see `code_utils/utils/pyramid.py`)
+POINT_BUDGET = 1_000_000
+
 # fmt: off
 # --------------------------------- Visualization ---------------------------------
 def plot_multi_sensors(
@@ -92,45 +84,26 @@ def plot_multi_sensors(
     # 0. Visualize the ETRI timeline
     row_idx = 1
     if "show timeline" in selected_items:
-        df_labels_user = df_labels[df_labels["user"] == fold_usr_subf_start_end_sens_lst[0][1] ]
+        # the (per-user) labels stem from the parsed ETRI notebook and are loaded lazily
+        df_labels_user = load_user_labels(
+            processed_etri_path / "labels.parquet", fold_usr_subf_start_end_sens_lst[0][1]
+        )
         add_etri_timeline_to_fig(fig, df_labels_user, row=row_idx)
         row_idx += 1
 
     # 1. Visualize the sensor data
-    for (fold, usr, subf, start, end, sensors) in fold_usr_subf_start_end_sens_lst:
-        sensors = [] if not isinstance(sensors, list) else sensors
-        for sensor in sensors:
-            folder_subfolder_dict = _create_subfolder_dict(subf)
-            sensor_path = Path(fold) / usr / folder_subfolder_dict.get(fold, "")
-
-            df_list = []
-            for dates in pd.date_range(
-                datetime.strptime(start, "%Y_%m_%d").date(),
-                datetime.strptime(end, "%Y_%m_%d").date(),
-                freq="D",
-            ):
-                sensor_files = list(sensor_path.glob(f"{sensor}_{dates.strftime('%Y_%m_%d')}*"))
-                if len(sensor_files) != 1:
-                    continue
-
-                sensor_file: Path = sensor_files[0]
-                df_sensor = pd.read_parquet(sensor_file)
-                if "timestamp" in df_sensor.columns:
-                    df_sensor = df_sensor.set_index("timestamp")
-                df_list.append(df_sensor)
-            df_sensor = pd.concat(df_list)
-
-            for col in sorted(set(df_sensor.columns.values).difference(["index", "timestamp"])):
-                print(f"{col}" + f" {len(df_sensor[col]):,} " + "-" * 30)
-                print(col, df_sensor[col].dtype)
-                fig.add_trace(
-                    trace=go.Scattergl(x=[], y=[], name=col),
-                    row=row_idx,
-                    col=1,
-                    hf_x=df_sensor[col].index,
-                    hf_y=df_sensor[col],
-                )
-            row_idx += 1
+    for df_sensor in load_sensor_data(fold_usr_subf_start_end_sens_lst, point_budget=POINT_BUDGET):
+        for col in sorted(set(df_sensor.columns.values).difference(["index", "timestamp"])):
+            print(f"{col}" + f" {len(df_sensor[col]):,} " + "-" * 30)
+            print(col, df_sensor[col].dtype)
+            fig.add_trace(
+                trace=go.Scattergl(x=[], y=[], name=col),
+                row=row_idx,
+                col=1,
+                hf_x=df_sensor[col].index,
+                hf_y=df_sensor[col],
+            )
+        row_idx += 1
     return fig
 
 
@@ -138,16 +111,17 @@ def plot_multi_sensors(
 # -------- plot or update graph ---------
 @app.callback(
     Output("resampled-graph", "figure"),
-    ServersideOutput("store", "data"),
+    Output("store", "data"),
     [
         Input("plot-button", "n_clicks"),
+        State("store", "data"),
         State("checklist", "value"),
         State("start-date", "value"),
         State("end-date", "value"),
         *selector_states,
     ],
 )
-def plot_or_update_graph(_, selected_items, start_date, end_date, *folder_list):
+def plot_or_update_graph(_, fig_handle, selected_items, start_date, end_date, *folder_list):
     selected_items = [] if selected_items is None else selected_items
     it = iter(folder_list)
     folder_user_day_sensor_list = []
@@ -163,7 +137,8 @@ def plot_or_update_graph(_, selected_items, start_date, end_date, *folder_list):
             selected_items=selected_items,
             fold_usr_subf_start_end_sens_lst=folder_user_day_sensor_list,
         )
-        return fig, fig
+        # only a handle of the (server-side stored) figure is sent to the client
+        return fig, figure_store.put(fig, replace=fig_handle)
     return dash.no_update, dash.no_update
 
 
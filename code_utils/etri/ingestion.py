@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""Parallel ingestion of the (interim) ETRI sensor csv files into per-day parquet.
+
+The interim ETRI data (see `notebooks/etri/README.md`) consists of thousands of
+small csv files, located at `<interim>/<archive>/<user>/<day>/<sensor>/<epoch>.csv`,
+whose `timestamp` column is a (seconds) offset w.r.t. the file its epoch.
+
+Alternatively, `ingest_etri_archive` streams the csv members straight from the raw
+`user*.7z` archives (via the `7z` binary), omitting the interim copy.
+
+Usage::
+
+    python -m code_utils.etri.ingestion
+"""
+from __future__ import annotations
+
+import bisect
+import io
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+from tqdm.auto import tqdm
+
+from code_utils.etri.mapping_dicts import (
+    sensor_dtype_mapping_dict,
+    sensor_rename_mapping_dict,
+)
+from code_utils.utils.dataframes import to_parquet_per_day
+from code_utils.utils.util import find_7z_binary
+
+ETRI_TZ = "Asia/Seoul"
+
+
+def _parse_sensor_csv(source, sensor: str, epoch_s: int, tz_str: str) -> pa.Table:
+    """Parse a single ETRI sensor csv (a path or file-like object) into a table
+    with a tz-aware `timestamp` column."""
+    column_types = {
+        col: pa.type_for_alias(dtype)
+        for col, dtype in sensor_dtype_mapping_dict[sensor].items()
+    }
+    table = csv.read_csv(
+        source,
+        # the files are small, hence the parallelism is applied over the files
+        read_options=csv.ReadOptions(use_threads=False),
+        convert_options=csv.ConvertOptions(column_types=column_types),
+    )
+
+    # vectorized epoch + offset timestamping (in ns)
+    offset_s = table["timestamp"].to_numpy().astype(np.float64)
+    ts = epoch_s * 1_000_000_000 + np.round(offset_s * 1e9).astype(np.int64)
+    table = table.set_column(
+        table.schema.get_field_index("timestamp"),
+        "timestamp",
+        pa.array(ts, type=pa.timestamp("ns", tz=tz_str)),
+    )
+
+    rename = sensor_rename_mapping_dict.get(sensor, {})
+    return table.rename_columns([rename.get(c, c) for c in table.column_names])
+
+
+def _to_sorted_df(tables: List[pa.Table]) -> pd.DataFrame:
+    """Concatenate the `tables` and (stable) sort them on their `timestamp`."""
+    table = pa.concat_tables(tables)
+    table = table.take(pc.sort_indices(table, sort_keys=[("timestamp", "ascending")]))
+    return table.to_pandas()
+
+
+def read_etri_sensor_csv(
+    sensor_csv_path: Union[str, Path], tz_str: str = ETRI_TZ
+) -> pd.DataFrame:
+    """Read a single ETRI sensor csv file.
+
+    Parameters
+    ----------
+    sensor_csv_path : Union[str, Path]
+        The path of the csv file, i.e., `<...>/<sensor>/<epoch>.csv`.
+    tz_str : str, optional
+        The timezone of the parsed timestamps, by default "Asia/Seoul".
+
+    Returns
+    -------
+    pd.DataFrame
+        The sensor data, with a tz-aware `timestamp` column.
+
+    """
+    sensor_csv_path = Path(sensor_csv_path)
+    sensor = sensor_csv_path.parent.name
+    return _parse_sensor_csv(
+        sensor_csv_path, sensor, int(sensor_csv_path.stem), tz_str
+    ).to_pandas()
+
+
+def ingest_etri_user_sensor(
+    sensor_csv_paths: Iterable[Path],
+    sensor: str,
+    save_dir: Path,
+    tz_str: str = ETRI_TZ,
+    n_jobs: Optional[int] = None,
+) -> List[Path]:
+    """Parse the csv files of a single (user, sensor) and write them per day.
+
+    Parameters
+    ----------
+    sensor_csv_paths : Iterable[Path]
+        The csv files of the (user, sensor).
+    sensor : str
+        The sensor name, must be a key of `sensor_dtype_mapping_dict`.
+    save_dir : Path
+        The (user) directory in which the `<sensor>_<yyyy>_<mm>_<dd>.parquet` files
+        are written.
+    tz_str : str, optional
+        The timezone of the parsed timestamps, by default "Asia/Seoul".
+    n_jobs : int, optional
+        The number of threads used to parse the csv files & write the parquet
+        files, by default None, i.e., the default number of workers of a
+        `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    List[Path]
+        The paths of the written parquet files.
+
+    """
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        tables = list(
+            pool.map(
+                lambda p: _parse_sensor_csv(p, sensor, int(p.stem), tz_str),
+                sensor_csv_paths,
+            )
+        )
+    if not len(tables):
+        return []
+    return to_parquet_per_day(
+        _to_sorted_df(tables), save_dir, sensor, time_col="timestamp", n_jobs=n_jobs
+    )
+
+
+def ingest_etri_sensor_data(
+    interim_dir: Path,
+    processed_dir: Path,
+    users: Optional[List[str]] = None,
+    sensors: Optional[List[str]] = None,
+    tz_str: str = ETRI_TZ,
+    n_jobs: Optional[int] = None,
+) -> Dict[str, Dict[str, List[Path]]]:
+    """Convert the interim ETRI sensor csv files into per-day parquet files.
+
+    The parquet files are written to
+    `<processed_dir>/<user>/<sensor>_<yyyy>_<mm>_<dd>.parquet`.
+
+    Parameters
+    ----------
+    interim_dir : Path
+        The directory which contains the extracted ETRI `.7z` archives.
+    processed_dir : Path
+        The directory in which the processed (per-user) data is written.
+    users : List[str], optional
+        The users which are converted, by default None, i.e., all users.
+    sensors : List[str], optional
+        The sensors which are converted, by default None, i.e., all sensors of
+        `sensor_dtype_mapping_dict`.
+    tz_str : str, optional
+        The timezone of the parsed timestamps, by default "Asia/Seoul".
+    n_jobs : int, optional
+        The number of threads, by default None, i.e., the default number of workers
+        of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    Dict[str, Dict[str, List[Path]]]
+        The written parquet files, per user and sensor.
+
+    """
+    if users is None:
+        users = sorted({p.name for p in interim_dir.glob("*/user*") if p.is_dir()})
+    sensors = list(sensor_dtype_mapping_dict) if sensors is None else sensors
+
+    written = {}
+    user_bar = tqdm(users)
+    for user in user_bar:
+        user_bar.set_description(user)
+        written[user] = {}
+        for sensor in tqdm(sensors, leave=False):
+            csv_paths = sorted(interim_dir.glob(f"*/{user}/*/{sensor}/*.csv"))
+            written[user][sensor] = ingest_etri_user_sensor(
+                csv_paths, sensor, processed_dir / user, tz_str=tz_str, n_jobs=n_jobs
+            )
+    return written
+
+
+# ------------------------------ 7z archive streaming ------------------------------
+def _list_7z_members(archive: Path) -> List[Tuple[str, int]]:
+    """List the (path, size) of the file members of `archive`, in archive order."""
+    out = subprocess.run(
+        [find_7z_binary(), "l", "-slt", "-ba", str(archive)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    members = []
+    for block in out.split("\n\n"):
+        props = dict(
+            line.split(" = ", 1) for line in block.splitlines() if " = " in line
+        )
+        if "Path" not in props:
+            continue
+        is_dir = props.get("Folder") == "+" or props.get("Attributes", "")[:1] == "D"
+        if not is_dir:
+            members.append((props["Path"], int(props.get("Size") or 0)))
+    return members
+
+
+def _iter_7z_members(
+    archive: Path, members: List[Tuple[str, int]]
+) -> Iterator[Tuple[str, bytes]]:
+    """Stream the content of the given `archive` `members` in a single 7z pass.
+
+    The members are written (in archive order) to the stdout of a single 7z
+    process, after which the stream is split using the listed member sizes.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt") as list_file:
+        list_file.write("\n".join(name for name, _ in members))
+        list_file.flush()
+        proc = subprocess.Popen(
+            [find_7z_binary(), "x", "-so", "-y", str(archive), f"@{list_file.name}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            for name, size in members:
+                data = proc.stdout.read(size)
+                if len(data) != size:
+                    raise IOError(f"unexpected end of the 7z stream at {name}")
+                yield name, data
+        except BaseException:
+            # an error (or the early closing of this generator) is propagated as is,
+            # i.e., it is not masked by the exit status of the killed 7z process
+            proc.kill()
+            raise
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+
+def _split_table(table: pa.Table, cutoff: pd.Timestamp) -> Tuple[pa.Table, pa.Table]:
+    """Split `table` into its rows before and from `cutoff` (on `timestamp`)."""
+    cutoff = pa.scalar(cutoff.value, type=table.schema.field("timestamp").type)
+    before = pc.less(table["timestamp"], cutoff)
+    return table.filter(before), table.filter(pc.invert(before))
+
+
+def ingest_etri_archive(
+    archive: Path,
+    processed_dir: Path,
+    users: Optional[List[str]] = None,
+    sensors: Optional[List[str]] = None,
+    tz_str: str = ETRI_TZ,
+    n_jobs: Optional[int] = None,
+) -> Dict[str, Dict[str, List[Path]]]:
+    """Convert the sensor csv members of a raw ETRI `.7z` archive into per-day
+    parquet files, without extracting the archive to disk.
+
+    Each user is streamed in a single 7z pass, whose csv members are parsed in
+    memory (by a thread pool) while the stream is being read. The rows of a csv
+    member do not precede its epoch, hence, the days of a sensor that lie before
+    the epochs of all its remaining members are complete; these are written (and
+    released) right away. As such, only the (incomplete) days of each sensor are
+    kept in memory.
+
+    Parameters
+    ----------
+    archive : Path
+        The raw ETRI archive, e.g., `<raw>/user01-06.7z`.
+    processed_dir : Path
+        The directory in which the processed (per-user) data is written.
+    users : List[str], optional
+        The users which are converted, by default None, i.e., all users of the
+        archive.
+    sensors : List[str], optional
+        The sensors which are converted, by default None, i.e., all sensors of
+        `sensor_dtype_mapping_dict`.
+    tz_str : str, optional
+        The timezone of the parsed timestamps, by default "Asia/Seoul".
+    n_jobs : int, optional
+        The number of threads, by default None, i.e., the default number of workers
+        of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    Dict[str, Dict[str, List[Path]]]
+        The written parquet files, per user and sensor.
+
+    Raises
+    ------
+    ValueError
+        If a csv member contains rows of a day which was already written.
+
+    """
+    sensors = list(sensor_dtype_mapping_dict) if sensors is None else sensors
+
+    # group the sensor csv members (.../<user>/<day>/<sensor>/<epoch>.csv) per user
+    user_members: Dict[str, List[Tuple[str, int]]] = {}
+    for name, size in _list_7z_members(archive):
+        parts = PurePosixPath(name.replace("\\", "/")).parts
+        if len(parts) < 4 or parts[-2] not in sensors or parts[-1][-4:] != ".csv":
+            continue
+        user_members.setdefault(parts[-4], []).append((name, size))
+    users = sorted(user_members) if users is None else users
+
+    written = {}
+    for user in tqdm(users):
+        members = user_members.get(user, [])
+        # the (sorted) epochs of the members which are not yet read, per sensor
+        remaining: Dict[str, List[int]] = {sensor: [] for sensor in sensors}
+        for name, _ in members:
+            path = PurePosixPath(name.replace("\\", "/"))
+            remaining[path.parent.name].append(int(path.stem))
+        for epochs in remaining.values():
+            epochs.sort()
+
+        def _day(epoch: int) -> pd.Timestamp:
+            return pd.Timestamp(epoch, unit="s", tz=tz_str).normalize()
+
+        # the (exclusive) end of the days which are written, per sensor
+        written_until = {
+            s: _day(epochs[0]) for s, epochs in remaining.items() if epochs
+        }
+        written[user] = {sensor: [] for sensor in sensors}
+        buffers: Dict[str, List[pa.Table]] = {sensor: [] for sensor in sensors}
+        futures: Dict[str, list] = {sensor: [] for sensor in sensors}
+
+        def _write(sensor: str, cutoff: Optional[pd.Timestamp]):
+            """Write the rows of `sensor` before `cutoff` (None = all rows)."""
+            tables = buffers[sensor] + [f.result() for f in futures[sensor]]
+            buffers[sensor], futures[sensor] = [], []
+            if any(
+                pc.min(t["timestamp"]).value < written_until[sensor].value
+                for t in tables
+                if len(t)
+            ):
+                raise ValueError(f"{user} {sensor}: rows of an already written day")
+            table = pa.concat_tables(tables)
+            if cutoff is not None:
+                table, rest = _split_table(table, cutoff)
+                buffers[sensor], written_until[sensor] = [rest], cutoff
+            if len(table):
+                written[user][sensor] += to_parquet_per_day(
+                    _to_sorted_df([table]),
+                    processed_dir / user,
+                    sensor,
+                    time_col="timestamp",
+                    n_jobs=n_jobs,
+                )
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            for name, data in _iter_7z_members(archive, members):
+                path = PurePosixPath(name.replace("\\", "/"))
+                sensor, epoch = path.parent.name, int(path.stem)
+                futures[sensor].append(
+                    pool.submit(
+                        _parse_sensor_csv, io.BytesIO(data), sensor, epoch, tz_str
+                    )
+                )
+                epochs = remaining[sensor]
+                epochs.pop(bisect.bisect_left(epochs, epoch))
+
+                # the days before the first day of the remaining members are complete
+                if not len(epochs):
+                    _write(sensor, None)
+                elif _day(epochs[0]) > written_until[sensor]:
+                    _write(sensor, _day(epochs[0]))
+    return written
+
+
+if __name__ == "__main__":
+    from code_utils.path_conf import interim_etri_path, processed_etri_path
+
+    ingest_etri_sensor_data(interim_etri_path, processed_etri_path)
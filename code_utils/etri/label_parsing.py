@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Vectorized parsing of the ETRI (per-day) label csv files.
+
+The label csv files are located at `<interim>/<archive>/<user>/<day>/<day>_label.csv`.
+All files are concatenated first, after which the option columns are mapped in a
+single vectorized pass via precompiled categorical code tables (instead of
+row-wise `apply` / `map` calls).
+
+The resulting `labels.parquet` file is written with a row group per user, which
+allows `load_user_labels` to (lazily) read the labels of a single user.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from code_utils.etri.ingestion import ETRI_TZ
+from code_utils.etri.mapping_dicts import (
+    action_option_mapping,
+    action_sub_option_mapping,
+    activity_mapping,
+    condition_sub1_option_mapping,
+    condition_sub2_option_mapping,
+)
+from code_utils.utils.frame_cache import FrameCache
+
+# The label columns which are stored as categoricals
+category_cols = [
+    "action",
+    "actionOption",
+    "actionSub",
+    "actionSubOption",
+    "condition",
+    "conditionSub1Option",
+    "conditionSub2Option",
+    "activity",
+    "user",
+    "place",
+]
+# The columns of the parsed labels
+label_cols = [
+    "timestamp",
+    "action",
+    "actionOption",
+    "actionSub",
+    "actionSubOption",
+    "condition",
+    "conditionSub1Option",
+    "conditionSub2Option",
+    "place",
+    "emotionPositive",
+    "emotionTension",
+    "activity",
+    "user",
+]
+
+
+class _CodeTable:
+    """A precompiled (numeric key -> label) mapping to categorical codes."""
+
+    def __init__(self, mapping: Dict[int, str]):
+        self.keys = pd.Index(np.array(list(mapping), dtype=np.float64))
+        self.categories = pd.Index(sorted(set(mapping.values())))
+        self.codes = self.categories.get_indexer(list(mapping.values()))
+
+    def lookup(self, values: pd.Series, strict: bool = False) -> np.ndarray:
+        """Return the categorical codes of `values` (-1 for unknown / NaN values)."""
+        idx = self.keys.get_indexer(pd.to_numeric(values).astype(np.float64))
+        if strict and (idx < 0).any():
+            raise KeyError(f"unknown values: {set(values[idx < 0])}")
+        return np.where(idx >= 0, self.codes[idx], -1)
+
+    def map(self, values: pd.Series, strict: bool = False) -> pd.Categorical:
+        return pd.Categorical.from_codes(
+            self.lookup(values, strict), self.categories
+        ).remove_unused_categories()
+
+
+# the precompiled code tables
+_action_option_table = _CodeTable(action_option_mapping)
+_condition_sub1_option_table = _CodeTable(condition_sub1_option_mapping)
+_condition_sub2_option_table = _CodeTable(condition_sub2_option_mapping)
+_activity_table = _CodeTable(activity_mapping)
+_action_sub_option_categories = pd.Index(
+    sorted({v for m in action_sub_option_mapping.values() for v in m.values()})
+)
+_action_sub_option_tables = {
+    action_sub: _CodeTable(mapping)
+    for action_sub, mapping in action_sub_option_mapping.items()
+}
+
+
+def _map_action_sub_option(df_label: pd.DataFrame) -> pd.Categorical:
+    """Map the `actionSubOption` column, whose mapping depends on `actionSub`."""
+    codes = np.full(len(df_label), -1)
+    for action_sub, table in _action_sub_option_tables.items():
+        mask = (df_label["actionSub"] == action_sub).values
+        sub_codes = table.lookup(df_label["actionSubOption"][mask])
+        # convert the sub-table codes into codes of the union categories
+        union_codes = _action_sub_option_categories.get_indexer(table.categories)
+        codes[mask] = np.where(sub_codes >= 0, union_codes[sub_codes], -1)
+    return pd.Categorical.from_codes(
+        codes, _action_sub_option_categories
+    ).remove_unused_categories()
+
+
+def _empty_labels(tz_str: str) -> pd.DataFrame:
+    """Return an empty label frame with the (parsed) label schema."""
+    dtypes = {c: "float64" for c in label_cols}
+    dtypes.update({c: "category" for c in category_cols})
+    dtypes["timestamp"] = pd.DatetimeTZDtype(tz=tz_str)
+    return pd.DataFrame({c: pd.Series(dtype=dtypes[c]) for c in label_cols})
+
+
+def _read_label_csv(label_csv_path: Path) -> pd.DataFrame:
+    df_label = pd.read_csv(label_csv_path)
+    df_label["user"] = label_csv_path.parent.parent.name
+    return df_label
+
+
+def parse_label_csv_files(
+    label_csv_paths: Iterable[Path],
+    tz_str: str = ETRI_TZ,
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """Parse (and concatenate) the ETRI label csv files.
+
+    Parameters
+    ----------
+    label_csv_paths : Iterable[Path]
+        The label csv files, i.e., `<...>/<user>/<day>/<day>_label.csv`.
+    tz_str : str, optional
+        The timezone of the parsed timestamps, by default "Asia/Seoul".
+    n_jobs : int, optional
+        The number of threads used to read the csv files, by default None, i.e.,
+        the default number of workers of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    pd.DataFrame
+        The labels of all files, with a tz-aware `timestamp` column, the mapped
+        option columns and the `category_cols` as categoricals, sorted by `user`
+        and `timestamp`. If no files are passed, an empty frame with the
+        `label_cols` is returned.
+
+    """
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        df_list = list(pool.map(_read_label_csv, label_csv_paths))
+    if not len(df_list):
+        return _empty_labels(tz_str)
+    df_label = pd.concat(df_list, ignore_index=True)
+
+    df_label["ts"] = pd.to_datetime(df_label["ts"], unit="s", utc=True).dt.tz_convert(
+        tz_str
+    )
+    # note: the action sub option is mapped first, as it depends on the (raw)
+    # actionSub values
+    df_label["actionSubOption"] = _map_action_sub_option(df_label)
+    df_label["actionOption"] = _action_option_table.map(
+        df_label["actionOption"], strict=True
+    )
+    df_label["conditionSub1Option"] = _condition_sub1_option_table.map(
+        df_label["conditionSub1Option"]
+    )
+    df_label["conditionSub2Option"] = _condition_sub2_option_table.map(
+        df_label["conditionSub2Option"]
+    )
+    df_label["activity"] = _activity_table.map(df_label["activity"])
+    df_label = df_label.rename(columns={"ts": "timestamp"})
+
+    for col in category_cols:
+        if df_label[col].dtype != "category":
+            df_label[col] = df_label[col].astype("category")
+    return df_label.sort_values(by=["user", "timestamp"], kind="stable")
+
+
+def ingest_etri_labels(
+    interim_dir: Path,
+    processed_dir: Path,
+    tz_str: str = ETRI_TZ,
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """Parse all the interim ETRI label csv files into `<processed_dir>/labels.parquet`.
+
+    Parameters
+    ----------
+    interim_dir : Path
+        The directory which contains the extracted ETRI `.7z` archives.
+    processed_dir : Path
+        The directory in which the `labels.parquet` file is written.
+    tz_str : str, optional
+        The timezone of the parsed timestamps, by default "Asia/Seoul".
+    n_jobs : int, optional
+        The number of threads used to read the csv files, by default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        The parsed labels, see `parse_label_csv_files`.
+
+    """
+    label_csv_paths = sorted(interim_dir.glob("*/*/*/*_label.csv"))
+    df_label = parse_label_csv_files(label_csv_paths, tz_str=tz_str, n_jobs=n_jobs)
+    write_labels_parquet(df_label, processed_dir / "labels.parquet")
+    return df_label
+
+
+def write_labels_parquet(df_label: pd.DataFrame, path: Path):
+    """Write the (user-sorted) labels with a parquet row group per user.
+
+    As such, the row group statistics of the `user` column allow to prune all the
+    other users when reading the labels of a single user.
+    """
+    table = pa.Table.from_pandas(df_label)
+    users = df_label["user"].astype(str).values
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])[: len(users)]
+    with pq.ParquetWriter(path, table.schema) as writer:
+        for start, end in zip(starts, np.r_[starts[1:], len(users)]):
+            writer.write_table(table.slice(start, end - start))
+
+
+# The labels of the recently loaded users
+_user_label_cache = FrameCache(max_bytes=256 * 1024**2)
+
+
+def load_user_labels(labels_path: Union[str, Path], user: str) -> pd.DataFrame:
+    """Load the labels of a single `user` from the `labels.parquet` file.
+
+    Only the row groups which (may) contain the user are read. The labels are
+    cached in memory, until the file its modification time changes.
+
+    Parameters
+    ----------
+    labels_path : Union[str, Path]
+        The path of the `labels.parquet` file, see `ingest_etri_labels`.
+    user : str
+        The user, e.g., "user01".
+
+    Returns
+    -------
+    pd.DataFrame
+        The labels of the user; note that this frame is shared (via the cache),
+        hence it should not be modified in place.
+
+    """
+    return _user_label_cache.get_or_load(
+        (str(labels_path), user),
+        lambda: pd.read_parquet(labels_path, filters=[("user", "==", user)]),
+        version=os.stat(labels_path).st_mtime_ns,
+    )
@@ -123,3 +123,20 @@ activity_mapping = {
     7: "Walking",
     8: "Running",
 }
+
+# ------------------------------- Sensor data -------------------------------
+# The dtypes of the (non-timestamp) columns of each sensor its csv files
+sensor_dtype_mapping_dict = {
+    "e4Acc": {"x": "float32", "y": "float32", "z": "float32"},
+    "e4Bvp": {"value": "float32"},
+    "e4Eda": {"eda": "float32"},
+    "e4Hr": {"hr": "float32"},
+    "e4Temp": {"temp": "float32"},
+    "mAcc": {"x": "float32", "y": "float32", "z": "float32"},
+    "mGps": {"lat": "float32", "long": "float32", "accuracy": "float32"},
+    "mGyr": {k: "float32" for k in ["x", "y", "z", "roll", "pitch", "yaw"]},
+    "mMag": {k: "float32" for k in ["x", "y", "z"]},
+}
+
+# The renamed columns of some sensors
+sensor_rename_mapping_dict = {"e4Bvp": {"value": "bvp"}}
@@ -2,19 +2,40 @@
 """
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import dash
 import dash_bootstrap_components as dbc
+import pandas as pd
+import pyarrow.parquet as pq
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
-from functional import seq
 from plotly_resampler import FigureResampler
 from trace_updater import TraceUpdater
 
+from code_utils.utils.figure_store import FigureStore
+from code_utils.utils.file_catalog import FileCatalog
+from code_utils.utils.frame_cache import FrameCache
+from code_utils.utils.pyramid import select_pyramid_level
+
 __author__ = "Jonas Van Der Donckt"
 
+# The (process-wide) catalog of the processed data files, which serves both the
+# selection widgets and the dashboard its data loaders
+file_catalog = FileCatalog()
+# The (process-wide) LRU cache of the loaded per-day sensor frames, which is shared
+# by the dashboard callbacks; its budget can be altered via `frame_cache.resize`
+frame_cache = FrameCache(max_bytes=2 * 1024**3)
+# The (server-side) store of the plotted figures, the dash "store" component only
+# holds the handle of its session its figure.
+# Note: the figures are kept in the memory of the (single) dashboard process; when
+# serving the dashboard with multiple worker processes, pass a private `cache_dir`
+figure_store = FigureStore(ttl_s=3600, max_entries=32)
+
 
 def serve_layout(app, title, checklist_options, name_folders_list) -> dbc.Container:
     """Constructs the app's layout.
@@ -85,16 +106,7 @@ def _update_user_widget(folder: Path, reverse=True):
         return []
     return [
         {"label": username, "value": username}
-        for username in sorted(
-            set(
-                list(
-                    seq(Path(folder).iterdir())
-                    .filter(lambda x: x.is_dir())
-                    .map(lambda x: x.name)
-                )
-            ),
-            reverse=reverse,
-        )
+        for username in sorted(file_catalog.users(folder), reverse=reverse)
     ]
 
 
@@ -108,14 +120,9 @@ def _update_date_widget(user_folder_subfolders, reverse=True):
             continue
 
         opt_list.extend(
-            seq(
-                Path(folder)
-                .joinpath(user)
-                .joinpath(_create_subfolder_dict(subfolder).get(folder, ""))
-                .iterdir()
+            file_catalog.dates(
+                folder, user, _create_subfolder_dict(subfolder).get(folder, "")
             )
-            .map(lambda x: "_".join(x.name.split(".")[0].split("_")[-3:]))
-            .to_list()
         )
 
     opt_list = sorted(set(opt_list), reverse=reverse)
@@ -128,20 +135,93 @@ def _update_sensor_widget(user, date, folder, sub_folders=""):
 
     folder_subfolder_dict = _create_subfolder_dict(sub_folders)
     sensors = sorted(
-        list(
-            seq(
-                Path(folder)
-                .joinpath(user)
-                .joinpath(folder_subfolder_dict.get(folder, ""))
-                .glob(f"*{date}*")
-            ).map(lambda x: "_".join(x.name.split("_")[:-3]))
-        ),
+        file_catalog.sensors(folder, user, date, folder_subfolder_dict.get(folder, "")),
         reverse=True,
     )
-    print("sensors", sensors)
     return [{"label": sensor_str, "value": sensor_str} for sensor_str in sensors]
 
 
+# ------------------------------- Data loading -------------------------------
+def _read_sensor_file(path: Path) -> pd.DataFrame:
+    """Read a (per-day) sensor parquet file, indexed by its timestamp.
+
+    Only the data columns are read, i.e., the (stored) "index" column is skipped.
+    """
+    pf = pq.ParquetFile(path)
+    columns = [c for c in pf.schema_arrow.names if c != "index"]
+    df = pf.read(columns=columns, use_pandas_metadata=True).to_pandas()
+    if "timestamp" in df.columns:
+        df = df.set_index("timestamp")
+    return df
+
+
+def _load_sensor_file(path: Path) -> pd.DataFrame:
+    """Return the (cached) data of a per-day sensor file, see `_read_sensor_file`.
+
+    The cache entries are invalidated when the file its modification time changes.
+    """
+    return frame_cache.get_or_load(
+        str(path), lambda: _read_sensor_file(path), version=os.stat(path).st_mtime_ns
+    )
+
+
+def load_sensor_data(
+    fold_usr_subf_start_end_sens_lst: List[Tuple[str, str, str, str, str, List[str]]],
+    point_budget: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+) -> List[pd.DataFrame]:
+    """Load the sensor data of the selected (folder, user, date range, sensors).
+
+    All the (per-day) files are read concurrently by a single thread pool, after
+    which each sensor its frame is constructed with a single concat. The per-day
+    frames are served from (and added to) the process-wide `frame_cache`.
+
+    Parameters
+    ----------
+    fold_usr_subf_start_end_sens_lst : List[Tuple[str, str, str, str, str, List[str]]]
+        The (folder, user, subfolder string, start date, end date, sensors) of each
+        selector, with the dates formatted as "%Y_%m_%d".
+    point_budget : int, optional
+        If passed, the coarsest precomputed (min / max / mean) pyramid level which
+        still has (at least) `point_budget` points is loaded for each sensor, see
+        `code_utils.utils.pyramid`. The raw data is only loaded when no level meets
+        the budget, i.e., for short (zoomed-in) ranges. By default None, i.e., the
+        raw data is always loaded.
+    n_jobs : int, optional
+        The number of reader threads, by default None, i.e., the default number of
+        workers of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    List[pd.DataFrame]
+        The (timestamp-indexed) data of each selected sensor, in selection order.
+
+    """
+    sensor_paths: List[List[Path]] = []
+    for fold, usr, subf, start, end, sensors in fold_usr_subf_start_end_sens_lst:
+        sensors = [] if not isinstance(sensors, list) else sensors
+        dates = pd.date_range(
+            datetime.strptime(start, "%Y_%m_%d").date(),
+            datetime.strptime(end, "%Y_%m_%d").date(),
+            freq="D",
+        ).strftime("%Y_%m_%d")
+        sub_folder = _create_subfolder_dict(subf).get(fold, "")
+        for sensor in sensors:
+            paths = file_catalog.get_paths(fold, usr, sensor, dates, sub_folder)
+            if point_budget is not None:
+                _, paths = select_pyramid_level(paths, point_budget)
+            sensor_paths.append(paths)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [
+            [pool.submit(_load_sensor_file, p) for p in paths] for paths in sensor_paths
+        ]
+        return [
+            pd.concat([f.result() for f in fs]) if len(fs) else pd.DataFrame()
+            for fs in futures
+        ]
+
+
 def _register_selection_callbacks(app, ids=None):
     if ids is None:
         ids = [""]
@@ -289,6 +369,11 @@ def multiple_folder_user_date_range_sensor_selector(
         body=True,
     )
 
+    # catalog the data folders up front, the first selection is then served from memory
+    for name_folders in name_folders_list:
+        for f in name_folders.values():
+            file_catalog.scan(f["user_folder"], f.get("sub_folder", ""))
+
     _register_selection_callbacks(app=app, ids=range(1, len(name_folders_list) + 1))
 
     # Also add the figure update callback
@@ -297,7 +382,8 @@ def multiple_folder_user_date_range_sensor_selector(
         Input("resampled-graph", "relayoutData"),
         State("store", "data"),
     )
-    def update_graph(relayoutdata: dict, fr: FigureResampler):
+    def update_graph(relayoutdata: dict, fig_handle: str):
+        fr: FigureResampler = figure_store.get(fig_handle)
         if fr is None or relayoutdata is None:
             raise dash.exceptions.PreventUpdate()
         return fr.construct_update_data(relayoutdata)
@@ -2,11 +2,15 @@
 """ Utility code for wrangling time series DataFrames """
 __author__ = "Jonas Van Der Donckt"
 
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from code_utils.utils.rle import RunLengthEncoding
+
 
 def groupby_consecutive(
     df: Union[pd.Series, pd.DataFrame], col_name: str = None
@@ -28,36 +32,42 @@ def groupby_consecutive(
     -------
     pd.DataFrame
         A new `DataFrame` view, with columns:
-        [`start`, `end`, `n_consecutive`, `col_name`], representing the
+        [`start`, `end`, `n_consecutive`, `col_name`, `next_start`], representing the
         start- and endtime of the consecutive range, the number of consecutive samples,
-        and the col_name's consecutive values.
-    """
-    if type(df) == pd.Series:
-        col_name = df.name
-        df = df.to_frame()
-
-    assert col_name in df.columns
-
-    df_cum = (
-        (df[col_name] != df[col_name].shift(1))
-        .astype("int")
-        .cumsum()
-        .rename("value_grp")
-        .to_frame()
-    )
-    df_cum["sequence_idx"] = df.index
-    df_cum[col_name] = df[col_name]
+        the col_name's consecutive values and the start of the next range (or the
+        end of the range for the last one).
 
-    df_grouped = pd.DataFrame(
+    Note
+    ----
+    The ranges are determined in a single (vectorized) pass over the values, which
+    scales to long (e.g., month-long 4Hz) series.
+    """
+    if isinstance(df, pd.Series):
+        s, col_name = df, df.name
+    else:
+        assert col_name in df.columns
+        s = df[col_name]
+
+    # 1. determine the start & end position of each consecutive range
+    # note: NaN != NaN, hence each NaN value results in a separate range
+    values = s.values
+    change = np.asarray(values[1:] != values[:-1], dtype=bool)
+    is_start, is_end = np.ones(len(s), dtype=bool), np.ones(len(s), dtype=bool)
+    is_start[1:] = change
+    is_end[:-1] = change
+    starts, ends = np.flatnonzero(is_start), np.flatnonzero(is_end)
+
+    # 2. obtain all the range properties via (vectorized) fancy indexing
+    index = s.index
+    return pd.DataFrame(
         {
-            "start": df_cum.groupby("value_grp")["sequence_idx"].first(),
-            "end": df_cum.groupby("value_grp")["sequence_idx"].last(),
-            "n_consecutive": df_cum.groupby("value_grp").size(),
-            col_name: df_cum.groupby("value_grp")[col_name].first(),
+            "start": index[starts],
+            "end": index[ends],
+            "n_consecutive": ends - starts + 1,
+            col_name: values[starts],
+            "next_start": index[np.append(starts[1:], ends[-1:])],
         }
-    ).reset_index(drop=True)
-    df_grouped["next_start"] = df_grouped.start.shift(-1).fillna(df_grouped["end"])
-    return df_grouped
+    )
 
 
 def arr_to_repetitive_count(arr: Union[pd.Series, List]) -> np.array:
@@ -74,19 +84,102 @@ def arr_to_repetitive_count(arr: Union[pd.Series, List]) -> np.array:
     -------
     np.array
 
+    Note
+    ----
+    Consecutive NaN values are considered as a single run.
+
+    """
+    return RunLengthEncoding.from_array(arr).run_lengths()
+
+
+def split_by_day(
+    df: pd.DataFrame, time_col: Optional[str] = None
+) -> Iterator[Tuple[pd.Timestamp, pd.DataFrame]]:
+    """Split the (time-sorted) `df` into (local) calendar days.
+
+    The (local) midnight boundaries are located once via a binary search on the
+    time values, after which each day is yielded as a (zero-copy) positional slice.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe which will be split, must be sorted on its time values.
+    time_col : str, optional
+        The (datetime) column on which the dataframe will be split, by default None.
+        If None, the dataframe its (datetime) index will be used.
+        Note that a timezone-aware time column will be split on its local midnights.
+
+    Yields
+    ------
+    Tuple[pd.Timestamp, pd.DataFrame]
+        The (midnight) timestamp of the day and the corresponding `df` slice.
+        Days without data are not yielded.
+
+    """
+    t = pd.DatetimeIndex(df.index if time_col is None else df[time_col])
+    if not len(t):
+        return
+    assert t.is_monotonic_increasing, "the time values must be sorted"
+
+    midnights = pd.date_range(t[0].normalize(), t[-1].normalize(), freq="D")
+    bounds = np.append(t.searchsorted(midnights[1:]), len(t))
+    start = 0
+    for date, end in zip(midnights, bounds):
+        if end > start:
+            yield date, df.iloc[start:end]
+        start = end
+
+
+def to_parquet_per_day(
+    df: pd.DataFrame,
+    save_dir: Union[str, Path],
+    prefix: str,
+    time_col: Optional[str] = None,
+    n_jobs: Optional[int] = None,
+    **kwargs,
+) -> List[Path]:
+    """Write `df` as one `<prefix>_<yyyy>_<mm>_<dd>.parquet` file per day.
+
+    The day slices are obtained via `split_by_day` and written concurrently by a
+    thread pool (pyarrow releases the GIL while encoding & writing).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe which will be written, must be sorted on its time values.
+    save_dir : Union[str, Path]
+        The directory in which the parquet files will be written, it will be
+        created if it does not exist yet.
+    prefix : str
+        The file name prefix, e.g., the sensor name.
+    time_col : str, optional
+        The (datetime) column on which the dataframe will be split, by default None.
+        If None, the dataframe its (datetime) index will be used.
+    n_jobs : int, optional
+        The number of writer threads, by default None, i.e., the default number of
+        workers of a `ThreadPoolExecutor`.
+    **kwargs
+        Additional keyword arguments that are passed to `pd.DataFrame.to_parquet`,
+        by default the pyarrow engine is used.
+
+    Returns
+    -------
+    List[Path]
+        The paths of the written parquet files, sorted by date.
+
     """
-    # 1. calculate where there are diffs -> indices
-    shift = np.diff(arr)
-    change = np.where(shift != 0)[0] + 1  # add 1 -> since diff reduces lenght with 1
-
-    # base case: all values are the same -> return array with all values = len(arr)
-    if len(change) <= 1:
-        a = np.empty(len(arr), dtype="uint32")
-        a.fill(len(arr))
-        return a
-
-    # calculte the diff of the whres and add
-    # * prepend the first value of change (lost due to diff)
-    # * append len(arr) - change[-1] (the number of repetitions of the last values)
-    diffs = np.append(np.insert(np.diff(change), 0, change[0]), len(arr) - change[-1])
-    return np.repeat(diffs, diffs)
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    kwargs = {"engine": "pyarrow", **kwargs}
+
+    def _write(date: pd.Timestamp, df_day: pd.DataFrame) -> Path:
+        path = save_dir / f"{prefix}_{date.strftime('%Y_%m_%d')}.parquet"
+        df_day.to_parquet(path, **kwargs)
+        return path
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [
+            pool.submit(_write, date, df_day)
+            for date, df_day in split_by_day(df, time_col=time_col)
+        ]
+        return [f.result() for f in futures]
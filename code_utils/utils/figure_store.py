@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""A (thread-safe) server-side store of (FigureResampler) figures.
+
+Instead of serializing the whole figure, including all its high-frequency data,
+into a (file system) dash store on every callback, the figure is kept in the server
+process its memory and only a small handle is passed through the dash `dcc.Store`.
+Entries expire after `ttl_s` seconds of inactivity and the number of stored
+figures is bounded (least recently used figures are evicted first).
+
+When the dashboard is served by multiple worker processes (e.g., gunicorn), a
+`cache_dir` should be passed. Each figure is then also pickled once (when it is
+stored) to `<cache_dir>/<handle>.pkl`, from which the other processes load (and
+then keep) it on their first access. As unpickling executes code, the cache dir
+must be private, i.e., owned by the current user and inaccessible to others.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import re
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Union
+
+# the handles are uuid4 hex strings
+_HANDLE_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def _is_handle(handle: Any) -> bool:
+    return isinstance(handle, str) and _HANDLE_PATTERN.fullmatch(handle) is not None
+
+
+def _ensure_private_dir(directory: Path):
+    """Create `directory` (mode 0700) and check that it is private.
+
+    Raises
+    ------
+    PermissionError
+        If `directory` is not a (non-symlinked) directory which is owned by the
+        current user and inaccessible to other users.
+
+    """
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = directory.lstat()
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or (hasattr(os, "getuid") and st.st_uid != os.getuid())
+        or st.st_mode & 0o077
+    ):
+        raise PermissionError(
+            f"the figure cache dir {directory} must be a directory which is owned by"
+            " the current user and is not accessible to others (i.e., mode 0700)"
+        )
+
+
+class FigureStore:
+    """A handle -> figure store with expiry.
+
+    Parameters
+    ----------
+    ttl_s : float, optional
+        The number of seconds after its last access after which a figure expires,
+        by default 3600.
+    max_entries : int, optional
+        The maximum number of figures which are kept in memory (per process), by
+        default 32.
+    cache_dir : Union[str, Path], optional
+        The private directory, shared by all server processes, in which the figures
+        are persisted. It is created (with mode 0700) if it does not exist, and
+        must be owned by the current user and inaccessible to others. By default
+        None, i.e., the figures are only kept in memory, hence a figure can only be
+        retrieved by the process which stored it.
+
+    """
+
+    def __init__(
+        self,
+        ttl_s: float = 3600,
+        max_entries: int = 32,
+        cache_dir: Optional[Union[str, Path]] = None,
+    ):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        if self.cache_dir is not None:
+            _ensure_private_dir(self.cache_dir)
+        self._lock = threading.Lock()
+        # handle -> (figure, last access time)
+        self._entries: OrderedDict = OrderedDict()
+
+    def _path(self, handle: str) -> Optional[Path]:
+        return None if self.cache_dir is None else self.cache_dir / f"{handle}.pkl"
+
+    def _expire(self, now: float):
+        """Remove the expired and, if required, the least recently used figures."""
+        while len(self._entries):
+            handle, (_, last_access) = next(iter(self._entries.items()))
+            if (
+                now - last_access <= self.ttl_s
+                and len(self._entries) <= self.max_entries
+            ):
+                break
+            del self._entries[handle]
+
+    def _expire_files(self):
+        """Remove the persisted figures which were not accessed within `ttl_s`."""
+        t_expired = time.time() - self.ttl_s
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                if path.stat().st_mtime < t_expired:
+                    path.unlink()
+            except FileNotFoundError:  # removed by another process
+                pass
+
+    def _remove_file(self, handle: str):
+        path = self._path(handle)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def put(self, fig: Any, replace: Optional[str] = None) -> str:
+        """Store `fig` and return its handle.
+
+        Parameters
+        ----------
+        fig : Any
+            The figure which is stored.
+        replace : str, optional
+            The handle of a previous figure (of the same session) which is removed,
+            by default None. Invalid handles are ignored.
+
+        Returns
+        -------
+        str
+            The handle of the stored figure.
+
+        """
+        handle = uuid.uuid4().hex
+        replace = replace if _is_handle(replace) else None
+        if self.cache_dir is not None:
+            # atomically write the figure, so that it is never read partially
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(fig, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._path(handle))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            if replace is not None:
+                self._remove_file(replace)
+            self._expire_files()
+
+        now = time.monotonic()
+        with self._lock:
+            if replace is not None:
+                self._entries.pop(replace, None)
+            self._entries[handle] = (fig, now)
+            self._expire(now)
+        return handle
+
+    def get(self, handle: Optional[str]) -> Optional[Any]:
+        """Return the figure of `handle`, None if it is not (or no longer) stored.
+
+        Note
+        ----
+        The handle stems from the client, hence all handles which are not a (32
+        character) hex string are rejected, i.e., None is returned.
+        """
+        if not _is_handle(handle):
+            return None
+        now = time.monotonic()
+        path = self._path(handle)
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.pop(handle, None)
+            if entry is not None:
+                self._entries[handle] = (entry[0], now)
+        if path is not None:
+            try:
+                # mark the (shared) figure as accessed, this keeps it from expiring
+                os.utime(path)
+                if entry is None:
+                    with open(path, "rb") as f:
+                        entry = (pickle.load(f), now)
+            except FileNotFoundError:  # expired or replaced
+                pass
+            if entry is not None:
+                with self._lock:
+                    self._entries.setdefault(handle, entry)
+                    self._expire(now)
+        return None if entry is None else entry[0]
+
+    def pop(self, handle: Optional[str]) -> Optional[Any]:
+        """Remove (and return) the figure of `handle`."""
+        if not _is_handle(handle):
+            return None
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+        self._remove_file(handle)
+        return None if entry is None else entry[0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""An in-memory catalog of the `<folder>/<user>/[<sub_folder>/]<sensor>_<yyyy>_<mm>_<dd>.*`
+files of the processed data trees.
+
+Each directory is listed (once) when it is first queried, after which its parsed
+listing is served from memory. A directory is only re-listed when its
+modification time changes, which is checked at most once per
+`refresh_interval_s` seconds. Hence, (dashboard) queries do not hit the (network)
+file system on every call.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+_FILE_PATTERN = re.compile(r"^(?P<sensor>.+)_(?P<date>\d{4}_\d{2}_\d{2})$")
+
+
+class _DirListing:
+    """The parsed listing of a single directory."""
+
+    def __init__(self, directory: Path):
+        self.sub_dirs: List[str] = []
+        # sensor -> date -> files
+        self.files: Dict[str, Dict[str, List[Path]]] = {}
+        if not directory.is_dir():
+            return
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir():
+                    self.sub_dirs.append(entry.name)
+                    continue
+                match = _FILE_PATTERN.match(entry.name.split(".")[0])
+                if match is not None:
+                    self.files.setdefault(match["sensor"], {}).setdefault(
+                        match["date"], []
+                    ).append(Path(entry.path))
+
+
+class FileCatalog:
+    """A (folder, user, sensor, date) -> path(s) index of processed data trees.
+
+    Parameters
+    ----------
+    refresh_interval_s : float, optional
+        The minimal number of seconds between two modification time checks of a
+        cataloged directory, by default 30.
+
+    """
+
+    def __init__(self, refresh_interval_s: float = 30):
+        self.refresh_interval_s = refresh_interval_s
+        self._lock = threading.RLock()
+        # directory -> (mtime_ns, last check time, listing)
+        self._dirs: Dict[Path, Tuple[Optional[int], float, _DirListing]] = {}
+
+    def _listing(self, directory: Union[str, Path]) -> _DirListing:
+        directory = Path(directory)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._dirs.get(directory)
+            if cached is not None and now - cached[1] < self.refresh_interval_s:
+                return cached[2]
+
+            try:
+                mtime = directory.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if cached is not None and cached[0] == mtime:
+                listing = cached[2]
+            else:
+                listing = _DirListing(directory)
+            self._dirs[directory] = (mtime, now, listing)
+            return listing
+
+    @staticmethod
+    def _data_dir(folder, user: str, sub_folder: Optional[str] = "") -> Path:
+        return Path(folder).joinpath(user).joinpath(sub_folder or "")
+
+    def refresh(self):
+        """Force a modification time check of all cataloged directories on their
+        next query."""
+        with self._lock:
+            self._dirs = {
+                d: (mtime, -float("inf"), listing)
+                for d, (mtime, _, listing) in self._dirs.items()
+            }
+
+    def scan(self, folder: Union[str, Path], sub_folder: Optional[str] = ""):
+        """Eagerly catalog the `folder` and all its user (data) directories."""
+        for user in self.users(folder):
+            self._listing(self._data_dir(folder, user, sub_folder))
+
+    # ---------------------------------- Queries ----------------------------------
+    def users(self, folder: Union[str, Path]) -> List[str]:
+        """Return the (sorted) users, i.e., sub directories, of `folder`."""
+        return sorted(self._listing(folder).sub_dirs)
+
+    def dates(
+        self, folder: Union[str, Path], user: str, sub_folder: Optional[str] = ""
+    ) -> List[str]:
+        """Return the (sorted) `yyyy_mm_dd` dates of the user its files."""
+        files = self._listing(self._data_dir(folder, user, sub_folder)).files
+        return sorted(
+            {date for sensor_dates in files.values() for date in sensor_dates}
+        )
+
+    def sensors(
+        self,
+        folder: Union[str, Path],
+        user: str,
+        date: str,
+        sub_folder: Optional[str] = "",
+    ) -> List[str]:
+        """Return the (sorted) sensors of the user which have a file on `date`."""
+        files = self._listing(self._data_dir(folder, user, sub_folder)).files
+        return sorted(sensor for sensor, dates in files.items() if date in dates)
+
+    def get_paths(
+        self,
+        folder: Union[str, Path],
+        user: str,
+        sensor: str,
+        dates: Iterable[str],
+        sub_folder: Optional[str] = "",
+    ) -> List[Path]:
+        """Return the files of the user its `sensor` for the given `dates`.
+
+        Note
+        ----
+        Dates for which the sensor has no (or multiple, i.e., ambiguous) files are
+        skipped.
+        """
+        files = self._listing(self._data_dir(folder, user, sub_folder)).files
+        sensor_dates = files.get(sensor, {})
+        return [
+            sensor_dates[date][0]
+            for date in dates
+            if len(sensor_dates.get(date, [])) == 1
+        ]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""A (thread-safe) memory-bounded LRU cache of loaded dataframes.
+
+The cache is bounded by the (shallow) memory usage of the cached frames. When
+adding a frame exceeds the byte budget, the least recently used frames are evicted.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+
+class FrameCache:
+    """An LRU cache of dataframes, bounded by a byte budget.
+
+    Each entry is stored together with a `version` (e.g., the modification time of
+    the file it was loaded from); a lookup with a different version is a miss.
+
+    Note
+    ----
+    The cached frames are shared between callers, hence they should not be modified
+    in place.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The byte budget of the cached frames, by default 2 GiB.
+
+    """
+
+    def __init__(self, max_bytes: int = 2 * 1024**3):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (version, frame, n_bytes)
+        self._entries: OrderedDict = OrderedDict()
+        self._n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _n_bytes_of(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(index=True, deep=False).sum())
+
+    def _evict(self):
+        """Evict the least recently used entries until the budget is respected."""
+        while self._n_bytes > self.max_bytes and len(self._entries):
+            _, (_, _, n_bytes) = self._entries.popitem(last=False)
+            self._n_bytes -= n_bytes
+            self.evictions += 1
+
+    def get(self, key: Hashable, version: Hashable = None) -> Optional[pd.DataFrame]:
+        """Return the cached frame of (`key`, `version`), None if not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, df: pd.DataFrame, version: Hashable = None):
+        """Cache `df` under (`key`, `version`), replacing a previous entry of `key`."""
+        n_bytes = self._n_bytes_of(df)
+        with self._lock:
+            prev = self._entries.pop(key, None)
+            if prev is not None:
+                self._n_bytes -= prev[2]
+            if n_bytes > self.max_bytes:
+                # the frame itself exceeds the budget, do not cache it
+                return
+            self._entries[key] = (version, df, n_bytes)
+            self._n_bytes += n_bytes
+            self._evict()
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], pd.DataFrame],
+        version: Hashable = None,
+    ) -> pd.DataFrame:
+        """Return the cached frame of (`key`, `version`), or load & cache it.
+
+        Note
+        ----
+        The `loader` is called outside of the lock, hence concurrent misses of the
+        same key may load it more than once.
+        """
+        df = self.get(key, version)
+        if df is None:
+            df = loader()
+            self.put(key, df, version)
+        return df
+
+    def resize(self, max_bytes: int):
+        """Set the byte budget, evicting entries if required."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """Remove all cached frames (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit / miss / eviction counters and the cache its size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "n_frames": len(self._entries),
+                "n_bytes": self._n_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __repr__(self) -> str:
+        s = self.stats()
+        return (
+            f"FrameCache(n_frames={s['n_frames']}, n_bytes={s['n_bytes']:,}/"
+            f"{s['max_bytes']:,}, hits={s['hits']}, misses={s['misses']})"
+        )
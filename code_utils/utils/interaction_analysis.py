@@ -1,57 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
 
+import numpy as np
 import pandas as pd
-from tqdm.auto import tqdm
 
 
 def _get_td_range_df(df_: pd.DataFrame, threshold=pd.Timedelta) -> pd.DataFrame:
-    data_list = []
-    for date in tqdm(
-        pd.date_range(df_.index[0].date(), df_.index[-1].date(), freq="D").tz_localize(
-            df_.index.tz
-        )
-    ):
-        df_day = df_[date : date + pd.Timedelta(days=1)]
-        if not len(df_day):
-            continue
+    """Compute the session table of the (sorted) datetime index of `df_`.
+
+    A session is a range of consecutive samples whose successive time differences
+    are at most `threshold`. Sessions are split at the (local) midnights, so each
+    session belongs to a single calendar `date`.
+
+    Note
+    ----
+    The table is computed in a single vectorized pass over the int64 index values.
 
-        gaps_start = df_day.index.to_series().diff() > threshold
-        gaps_start.iloc[[0]] = True
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with columns [`date`, `start`, `end`, `session_dur`,
+        `daily_wear_time`], where `daily_wear_time` is the sum of the session
+        durations of that `date`.
 
-        gaps_end = gaps_start.shift(-1)
-        gaps_end.iloc[[-1]] = True
+    """
+    t = pd.DatetimeIndex(df_.index)
+    columns = ["date", "start", "end", "session_dur", "daily_wear_time"]
+    if not len(t):
+        return pd.DataFrame(columns=columns)
 
-        gaps_start = df_day[gaps_start].index.to_list()
-        gaps_end = df_day[gaps_end].index.to_list()
-        data_list += [[date, gs, ge] for gs, ge in zip(gaps_start, gaps_end)]
+    # 1. assign each sample to its (local) calendar day
+    midnights = pd.date_range(t[0].normalize(), t[-1].normalize(), freq="D")
+    t_i8 = t.asi8
+    day_idx = np.searchsorted(midnights.asi8, t_i8, side="right") - 1
+
+    # 2. a new session starts after a gap or at the first sample of a day
+    is_start = np.ones(len(t), dtype=bool)
+    is_start[1:] = (np.diff(t_i8) > pd.Timedelta(threshold).value) | (
+        day_idx[1:] != day_idx[:-1]
+    )
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], len(t)) - 1
 
-    sessions = pd.DataFrame(data=data_list, columns=["date", "start", "end"])
+    sessions = pd.DataFrame(
+        {"date": midnights[day_idx[starts]], "start": t[starts], "end": t[ends]}
+    )
     sessions["session_dur"] = sessions.end - sessions.start
 
-    sessions = pd.merge(
-        sessions,
-        sessions.groupby("date")["session_dur"].sum().rename("daily_wear_time"),
-        left_on="date",
-        right_index=True,
-        how="outer",
+    # 3. the daily wear time, i.e., the sum of the session durations per day
+    sessions["daily_wear_time"] = sessions.groupby("date")["session_dur"].transform(
+        "sum"
     )
-    return sessions
+    return sessions[columns]
 
 
-def get_wearable_session_df(glob: Iterable[Path], fs_exp) -> pd.DataFrame:
-    data_list = []
-    for eligible_file in glob:
-        pqt = pd.read_parquet(eligible_file)  # .set_index("timestamp")
-        data_list.append(pqt)
+def _read_sorted_timestamps(path: Path) -> pd.DatetimeIndex:
+    """Read the (sorted) `timestamp` column of a single parquet file."""
+    ts = pd.DatetimeIndex(pd.read_parquet(path, columns=["timestamp"])["timestamp"])
+    return ts if ts.is_monotonic_increasing else ts.sort_values()
 
-    if not len(data_list):
-        return pd.DataFrame()
 
-    df_ = pd.concat(data_list)
-    df_ = df_.drop_duplicates(subset=["timestamp"]).set_index("timestamp").sort_index()
-    del data_list
-    return _get_td_range_df(df_, threshold=pd.Timedelta(seconds=1.1 / fs_exp))
+def _merge_sorted_runs(runs: Iterable[pd.DatetimeIndex]) -> pd.DatetimeIndex:
+    """Merge sorted timestamp runs into a single sorted index without duplicates."""
+    runs = [r for r in runs if len(r)]
+    if not len(runs):
+        return pd.DatetimeIndex([])
+
+    # merge the sorted runs; if the runs do not overlap (e.g., day files) this
+    # boils down to a concatenation, otherwise timsort merges the runs
+    runs = sorted(runs, key=lambda r: r[0])
+    t_i8 = np.concatenate([r.asi8 for r in runs])
+    if any(prev[-1] > nxt[0] for prev, nxt in zip(runs[:-1], runs[1:])):
+        t_i8 = np.sort(t_i8, kind="stable")
+    t_i8 = t_i8[np.append(True, np.diff(t_i8) != 0)]
+
+    index = pd.DatetimeIndex(t_i8.view("datetime64[ns]"))
+    if runs[0].tz is not None:
+        index = index.tz_localize("UTC").tz_convert(runs[0].tz)
+    return index
+
+
+def get_wearable_session_df(
+    glob: Iterable[Path], fs_exp, n_jobs: Optional[int] = None
+) -> pd.DataFrame:
+    """Compute the session table of a wearable sensor its parquet files.
+
+    Only the `timestamp` column of each file is read (concurrently, by a thread
+    pool). As each file is an already sorted run, the runs are merged (instead of
+    being globally sorted) after which duplicate timestamps are removed.
+
+    Parameters
+    ----------
+    glob : Iterable[Path]
+        The parquet files of a single sensor, each containing a `timestamp` column.
+    fs_exp : float
+        The expected sample frequency of the sensor, gaps larger than
+        `1.1 / fs_exp` seconds end a session.
+    n_jobs : int, optional
+        The number of reader threads, by default None, i.e., the default number of
+        workers of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    pd.DataFrame
+        The session table, see `_get_td_range_df`.
+
+    """
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        index = _merge_sorted_runs(pool.map(_read_sorted_timestamps, glob))
+
+    if not len(index):
+        return pd.DataFrame()
+    return _get_td_range_df(
+        pd.DataFrame(index=index), threshold=pd.Timedelta(seconds=1.1 / fs_exp)
+    )
 
 
 def get_label_interaction_df(df_user_label: pd.DataFrame) -> pd.DataFrame:
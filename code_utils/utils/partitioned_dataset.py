@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""A hive-partitioned (user / sensor / date) parquet dataset layout and reader.
+
+The layout is::
+
+    <root>/user=<user>/sensor=<sensor>/date=<yyyy-mm-dd>/part-0.parquet
+
+where each (time-sorted) file is written with bounded row groups, so that the
+parquet row group statistics allow pruning on the time column. As the partition
+paths are derived from the query itself, reading a (user, sensor, time range)
+does not require any directory listing.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from code_utils.utils.dataframes import split_by_day
+
+_PARTITIONING = ds.partitioning(
+    pa.schema([("user", pa.string()), ("sensor", pa.string()), ("date", pa.string())]),
+    flavor="hive",
+)
+
+
+def _partition_path(root: Path, user: str, sensor: str, date) -> Path:
+    return (
+        Path(root)
+        / f"user={user}"
+        / f"sensor={sensor}"
+        / f"date={date:%Y-%m-%d}"
+        / "part-0.parquet"
+    )
+
+
+def write_partitioned(
+    df: pd.DataFrame,
+    root: Union[str, Path],
+    user: str,
+    sensor: str,
+    time_col: str = "timestamp",
+    row_group_size: int = 65_536,
+    n_jobs: Optional[int] = None,
+) -> List[Path]:
+    """Write the (time-sorted) `df` of a (`user`, `sensor`) into the dataset.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The sensor data, must be sorted on its (tz-aware) `time_col`.
+    root : Union[str, Path]
+        The root directory of the dataset.
+    user : str
+        The user partition value.
+    sensor : str
+        The sensor partition value.
+    time_col : str, optional
+        The time column, by default "timestamp".
+    row_group_size : int, optional
+        The maximum number of rows per parquet row group, by default 65_536.
+    n_jobs : int, optional
+        The number of writer threads, by default None, i.e., the default number of
+        workers of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    List[Path]
+        The paths of the written (per-day) parquet files.
+
+    """
+
+    def _write(date: pd.Timestamp, df_day: pd.DataFrame) -> Path:
+        path = _partition_path(root, user, sensor, date)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df_day, preserve_index=False)
+        pq.write_table(table, path, row_group_size=row_group_size)
+        return path
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [
+            pool.submit(_write, date, df_day)
+            for date, df_day in split_by_day(df, time_col=time_col)
+        ]
+        return [f.result() for f in futures]
+
+
+def convert_to_partitioned(
+    src_dir: Union[str, Path],
+    root: Union[str, Path],
+    row_group_size: int = 65_536,
+    n_jobs: Optional[int] = None,
+) -> List[Path]:
+    """Convert a processed `<src_dir>/<user>/<sensor>_<yyyy>_<mm>_<dd>.parquet` tree
+    (e.g., the processed ETRI or mBrain data) into the partitioned layout.
+
+    Note
+    ----
+    The user partition value is the (user) folder name, the sensor and date are
+    parsed from the file name.
+
+    Returns
+    -------
+    List[Path]
+        The paths of the written parquet files.
+
+    """
+
+    def _convert(path: Path) -> Path:
+        *sensor, y, m, d = path.stem.split("_")
+        date = datetime(int(y), int(m), int(d))
+        out_path = _partition_path(root, path.parent.name, "_".join(sensor), date)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pq.read_table(path), out_path, row_group_size=row_group_size)
+        return out_path
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        return list(pool.map(_convert, sorted(Path(src_dir).glob("*/*.parquet"))))
+
+
+def read_partitioned(
+    root: Union[str, Path],
+    user: str,
+    sensor: str,
+    t_start: Optional[Union[str, pd.Timestamp]] = None,
+    t_end: Optional[Union[str, pd.Timestamp]] = None,
+    time_window: Optional[Tuple[time, time]] = None,
+    columns: Optional[List[str]] = None,
+    time_col: str = "timestamp",
+) -> pd.DataFrame:
+    """Read the data of a (`user`, `sensor`) within [`t_start`, `t_end`).
+
+    The (daily) partitions are pruned by constructing their paths from the query
+    and the row groups are pruned via the time column its statistics.
+
+    Example
+    -------
+    Reading the 10:00-12:00 window of each day within a week::
+
+        >>> read_partitioned(
+        ...     root, "user08", "e4Eda", "2020-09-01", "2020-09-08",
+        ...     time_window=(time(10), time(12)),
+        ... )
+
+    Parameters
+    ----------
+    root : Union[str, Path]
+        The root directory of the dataset.
+    user : str
+        The user partition value.
+    sensor : str
+        The sensor partition value.
+    t_start : Union[str, pd.Timestamp], optional
+        The (inclusive) start time, by default None. Timezone-naive values are
+        interpreted in the timezone of the data.
+    t_end : Union[str, pd.Timestamp], optional
+        The (exclusive) end time, by default None.
+        Note: if `t_start` or `t_end` is None, the (user, sensor) its partitions
+        are listed.
+    time_window : Tuple[time, time], optional
+        If passed, only the data within this [start, end) time of day window of
+        each day is read, by default None.
+    columns : List[str], optional
+        The columns which are read, by default None, i.e., all data columns.
+    time_col : str, optional
+        The time column, by default "timestamp".
+
+    Returns
+    -------
+    pd.DataFrame
+        The (time-sorted) data, without the partition columns.
+
+    """
+    sensor_dir = Path(root) / f"user={user}" / f"sensor={sensor}"
+    if t_start is None or t_end is None:
+        paths = sorted(sensor_dir.glob("date=*/*.parquet"))
+    else:
+        t0, t1 = pd.Timestamp(t_start), pd.Timestamp(t_end)
+        # the partition dates are in the (yet unknown) timezone of the data, hence
+        # tz-aware bounds are padded by a day; the row filter trims the surplus
+        pad = pd.Timedelta(days=1 if t0.tz is not None or t1.tz is not None else 0)
+        dates = pd.date_range(
+            (t0 - pad).tz_localize(None).normalize(),
+            (t1 + pad).tz_localize(None),
+            freq="D",
+        )
+        paths = [_partition_path(root, user, sensor, d) for d in dates]
+        paths = [p for p in paths if p.exists()]
+    if not len(paths):
+        return pd.DataFrame(columns=columns)
+
+    dataset = ds.dataset(
+        [str(p) for p in paths],
+        format="parquet",
+        partitioning=_PARTITIONING,
+        partition_base_dir=str(root),
+    )
+
+    # the time filters (in the timezone of the data), which prune the row groups
+    ts_type = dataset.schema.field(time_col).type
+    tz = getattr(ts_type, "tz", None)
+
+    def _ts(t) -> pd.Timestamp:
+        t = pd.Timestamp(t)
+        if tz is not None:
+            t = t.tz_localize(tz) if t.tz is None else t.tz_convert(tz)
+        return t
+
+    def _between(t0: pd.Timestamp, t1: pd.Timestamp) -> ds.Expression:
+        field = ds.field(time_col)
+        return (field >= pa.scalar(t0.value, type=pa.timestamp("ns", tz=tz))) & (
+            field < pa.scalar(t1.value, type=pa.timestamp("ns", tz=tz))
+        )
+
+    expr = None
+    if t_start is not None and t_end is not None:
+        expr = _between(_ts(t_start), _ts(t_end))
+    if time_window is not None:
+        days = sorted({p.parent.name.split("=")[1] for p in paths})
+        window_expr = None
+        for day in days:
+            t0 = _ts(datetime.combine(pd.Timestamp(day).date(), time_window[0]))
+            t1 = _ts(datetime.combine(pd.Timestamp(day).date(), time_window[1]))
+            e = _between(t0, t1)
+            window_expr = e if window_expr is None else window_expr | e
+        expr = window_expr if expr is None else expr & window_expr
+
+    if columns is None:
+        columns = [
+            c for c in dataset.schema.names if c not in _PARTITIONING.schema.names
+        ]
+    df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+    if time_col in df.columns and not df[time_col].is_monotonic_increasing:
+        df = df.sort_values(time_col, kind="stable", ignore_index=True)
+    return df
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Precomputed multi-resolution (min / max / mean) pyramids of per-day sensor files.
+
+For each processed `<data_dir>/<sensor>_<yyyy>_<mm>_<dd>.parquet` file, the pyramid
+levels are stored next to it, at
+`<data_dir>/pyramid/<resolution>/<sensor>_<yyyy>_<mm>_<dd>.parquet`, with a
+`timestamp` (bin start) column and a `<col>__min`, `<col>__max` and `<col>__mean`
+column per numeric data column. Only non-empty bins are stored.
+
+Usage::
+
+    python -m code_utils.utils.pyramid
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+PYRAMID_RESOLUTIONS = ("1s", "10s", "1min", "10min")
+PYRAMID_FOLDER = "pyramid"
+
+
+def pyramid_path(path: Union[str, Path], resolution: str) -> Path:
+    """Return the path of the `resolution` pyramid level of a per-day file."""
+    path = Path(path)
+    return path.parent / PYRAMID_FOLDER / resolution / path.name
+
+
+def _sorted_resolutions(resolutions: Sequence[str], reverse=False) -> List[str]:
+    return sorted(resolutions, key=pd.Timedelta, reverse=reverse)
+
+
+def _reduce(
+    t_i8: np.ndarray, aggs: Dict[str, Tuple[np.ndarray, ...]], res_ns: int
+) -> Tuple[np.ndarray, Dict[str, Tuple[np.ndarray, ...]]]:
+    """Reduce the (sorted) (min, max, sum, count) aggregates into `res_ns` bins."""
+    bins = t_i8 // res_ns * res_ns
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])[: len(bins)]
+    return bins[starts], {
+        col: (
+            np.fmin.reduceat(a_min, starts),
+            np.fmax.reduceat(a_max, starts),
+            np.add.reduceat(a_sum, starts),
+            np.add.reduceat(a_cnt, starts),
+        )
+        for col, (a_min, a_max, a_sum, a_cnt) in aggs.items()
+    }
+
+
+def build_pyramid_file(
+    path: Union[str, Path],
+    resolutions: Sequence[str] = PYRAMID_RESOLUTIONS,
+    time_col: str = "timestamp",
+) -> List[Path]:
+    """Build the pyramid levels of a single (per-day) sensor parquet file.
+
+    Each level is aggregated from the previous (finer) level, NaNs are ignored.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        The (time-sorted) per-day sensor parquet file.
+    resolutions : Sequence[str], optional
+        The (pandas Timedelta) resolutions of the levels, by default
+        `PYRAMID_RESOLUTIONS`.
+    time_col : str, optional
+        The time column (or index), by default "timestamp".
+
+    Returns
+    -------
+    List[Path]
+        The paths of the written pyramid level files.
+
+    """
+    df = pd.read_parquet(path)
+    if time_col not in df.columns:
+        df = df.reset_index()
+    ts = pd.DatetimeIndex(df[time_col])
+    tz = ts.tz
+    t_i8 = ts.asi8
+    if len(t_i8) and not (np.diff(t_i8) >= 0).all():
+        order = np.argsort(t_i8, kind="stable")
+        t_i8, df = t_i8[order], df.iloc[order]
+
+    data_cols = [
+        c
+        for c in df.columns
+        if c not in (time_col, "index")
+        and pd.api.types.is_numeric_dtype(df[c])
+        and not pd.api.types.is_bool_dtype(df[c])
+    ]
+    dtypes = {
+        c: df[c].dtype if df[c].dtype.kind == "f" else np.float64 for c in data_cols
+    }
+    aggs = {}
+    for c in data_cols:
+        v = df[c].values.astype(np.float64)
+        valid = ~np.isnan(v)
+        aggs[c] = (v, v, np.where(valid, v, 0), valid.astype(np.int64))
+
+    written = []
+    for resolution in _sorted_resolutions(resolutions):
+        t_i8, aggs = _reduce(t_i8, aggs, pd.Timedelta(resolution).value)
+        index = pd.DatetimeIndex(t_i8.view("datetime64[ns]"))
+        index = index.tz_localize("UTC").tz_convert(tz) if tz is not None else index
+        df_level = pd.DataFrame({time_col: index})
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for c, (a_min, a_max, a_sum, a_cnt) in aggs.items():
+                df_level[f"{c}__min"] = a_min.astype(dtypes[c])
+                df_level[f"{c}__max"] = a_max.astype(dtypes[c])
+                df_level[f"{c}__mean"] = (a_sum / a_cnt).astype(dtypes[c])
+
+        out_path = pyramid_path(path, resolution)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        df_level.to_parquet(out_path, engine="pyarrow", index=False)
+        written.append(out_path)
+    return written
+
+
+def build_pyramid(
+    data_dir: Union[str, Path],
+    sensors: Optional[List[str]] = None,
+    resolutions: Sequence[str] = PYRAMID_RESOLUTIONS,
+    overwrite: bool = False,
+    n_jobs: Optional[int] = None,
+) -> List[Path]:
+    """Build the pyramid levels of the per-day sensor files in `data_dir`.
+
+    Parameters
+    ----------
+    data_dir : Union[str, Path]
+        The (user) directory which contains the `<sensor>_<yyyy>_<mm>_<dd>.parquet`
+        files.
+    sensors : List[str], optional
+        The sensors whose pyramids are built, by default None, i.e., all sensors.
+    resolutions : Sequence[str], optional
+        The resolutions of the levels, by default `PYRAMID_RESOLUTIONS`.
+    overwrite : bool, optional
+        Whether pyramids which are more recent than their source file are rebuilt,
+        by default False.
+    n_jobs : int, optional
+        The number of threads, by default None, i.e., the default number of workers
+        of a `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    List[Path]
+        The paths of the written pyramid level files.
+
+    """
+
+    def _is_outdated(path: Path) -> bool:
+        src_mtime = os.stat(path).st_mtime_ns
+        for resolution in resolutions:
+            level_path = pyramid_path(path, resolution)
+            if not level_path.exists() or os.stat(level_path).st_mtime_ns < src_mtime:
+                return True
+        return False
+
+    paths = [
+        p
+        for p in sorted(Path(data_dir).glob("*_????_??_??.parquet"))
+        if sensors is None or p.stem.rsplit("_", 3)[0] in sensors
+    ]
+    if not overwrite:
+        paths = [p for p in paths if _is_outdated(p)]
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        return sum(
+            pool.map(lambda p: build_pyramid_file(p, resolutions=resolutions), paths),
+            [],
+        )
+
+
+def select_pyramid_level(
+    paths: List[Path],
+    point_budget: int,
+    resolutions: Sequence[str] = PYRAMID_RESOLUTIONS,
+) -> Tuple[Optional[str], List[Path]]:
+    """Select the coarsest pyramid level which still has (at least) `point_budget` points.
+
+    The number of points of a level is retrieved from the parquet metadata. Levels
+    which are not available for all `paths` are skipped.
+
+    Parameters
+    ----------
+    paths : List[Path]
+        The (raw) per-day sensor files of the requested range.
+    point_budget : int
+        The point budget.
+    resolutions : Sequence[str], optional
+        The candidate resolutions, by default `PYRAMID_RESOLUTIONS`.
+
+    Returns
+    -------
+    Tuple[Optional[str], List[Path]]
+        The selected resolution and its files; (None, `paths`) when no level has
+        enough points, i.e., when the raw data should be used.
+
+    """
+    if not len(paths):
+        return None, paths
+    for resolution in _sorted_resolutions(resolutions, reverse=True):
+        level_paths = [pyramid_path(p, resolution) for p in paths]
+        if not all(p.exists() for p in level_paths):
+            continue
+        if sum(pq.read_metadata(p).num_rows for p in level_paths) >= point_budget:
+            return resolution, level_paths
+    return None, paths
+
+
+if __name__ == "__main__":
+    from tqdm.auto import tqdm
+
+    from code_utils.path_conf import processed_etri_path
+
+    for user_dir in tqdm(
+        sorted(p for p in processed_etri_path.iterdir() if p.is_dir())
+    ):
+        build_pyramid(user_dir)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Run-length encoding (RLE) of 1D arrays, with vectorized run operations."""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import numpy as np
+
+
+class RunLengthEncoding:
+    """A run-length encoded 1D array.
+
+    An array is represented by its runs (i.e., sequences of same consecutive
+    values), where each run is described by its start index, length and value.
+    All operations are vectorized and scale with the number of runs, except for
+    those that (explicitly) expand the runs back to the sample level.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        The start index of each run.
+    lengths : np.ndarray
+        The length (i.e., number of samples) of each run.
+    values : np.ndarray
+        The value of each run.
+
+    """
+
+    def __init__(self, starts: np.ndarray, lengths: np.ndarray, values: np.ndarray):
+        assert len(starts) == len(lengths) == len(values)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.values = np.asarray(values)
+
+    @classmethod
+    def from_array(cls, arr) -> RunLengthEncoding:
+        """Construct the run-length encoding of `arr`.
+
+        Note
+        ----
+        Consecutive NaN values are considered as a single run.
+        """
+        arr = np.asarray(arr)
+        if not len(arr):
+            return cls(np.empty(0), np.empty(0), arr[:0])
+
+        change = arr[1:] != arr[:-1]
+        if arr.dtype.kind in "fc":
+            change &= ~(np.isnan(arr[1:]) & np.isnan(arr[:-1]))
+        starts = np.concatenate([[0], np.flatnonzero(change) + 1])
+        lengths = np.diff(np.append(starts, len(arr)))
+        return cls(starts, lengths, arr[starts])
+
+    def __len__(self) -> int:
+        """Return the number of runs."""
+        return len(self.starts)
+
+    @property
+    def n_samples(self) -> int:
+        """Return the number of samples of the encoded array."""
+        return int(self.lengths.sum())
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(n_runs={len(self)}, "
+            + f"n_samples={self.n_samples})"
+        )
+
+    # ------------------------------ Run operations ---------------------------------
+    def select(
+        self,
+        value: Optional[Any] = None,
+        min_length: Optional[int] = None,
+        max_length: Optional[int] = None,
+        enclosed: bool = False,
+    ) -> np.ndarray:
+        """Return a boolean mask over the runs that satisfy all given conditions.
+
+        Parameters
+        ----------
+        value : Any, optional
+            If passed, only runs with this value are selected.
+        min_length : int, optional
+            If passed, only runs with a length >= `min_length` are selected.
+        max_length : int, optional
+            If passed, only runs with a length <= `max_length` are selected.
+        enclosed : bool, optional
+            If True, the first and last run are not selected, by default False.
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array of length `len(self)`.
+
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if value is not None:
+            mask &= self.values == value
+        if min_length is not None:
+            mask &= self.lengths >= min_length
+        if max_length is not None:
+            mask &= self.lengths <= max_length
+        if enclosed and len(mask):
+            mask[[0, -1]] = False
+        return mask
+
+    def _merge_runs(self, values: np.ndarray) -> RunLengthEncoding:
+        """Return the RLE with the run `values` replaced by `values`, merging the
+        adjacent runs which now have an equal value."""
+        if not len(values):
+            return RunLengthEncoding(self.starts, self.lengths, values)
+        keep = np.concatenate([[True], values[1:] != values[:-1]])
+        starts = self.starts[keep]
+        lengths = np.diff(np.append(starts, self.n_samples))
+        return RunLengthEncoding(starts, lengths, values[keep])
+
+    def replace(self, run_mask: np.ndarray, value: Any) -> RunLengthEncoding:
+        """Replace the value of the selected runs, merging equal adjacent runs."""
+        values = self.values.copy()
+        values[run_mask] = value
+        return self._merge_runs(values)
+
+    def fill_short_gaps(self, gap_value: Any, max_length: int) -> RunLengthEncoding:
+        """Fill the enclosed `gap_value` runs of at most `max_length` samples with
+        the value of their preceding run.
+
+        This is useful for e.g. boolean (SQI) arrays, where short `False` gaps
+        between `True` runs need to be filled.
+        """
+        run_mask = self.select(gap_value, max_length=max_length, enclosed=True)
+        values = self.values.copy()
+        idx = np.flatnonzero(run_mask)
+        values[idx] = values[idx - 1]
+        return self._merge_runs(values)
+
+    # -------------------------- Sample level expansion -----------------------------
+    def expand(self, run_mask: np.ndarray) -> np.ndarray:
+        """Expand a boolean mask over the runs into a sample-level boolean mask."""
+        return np.repeat(np.asarray(run_mask, dtype=bool), self.lengths)
+
+    def to_array(self) -> np.ndarray:
+        """Decode the run-length encoding into the original array."""
+        return np.repeat(self.values, self.lengths)
+
+    def run_lengths(self) -> np.ndarray:
+        """Return, for each sample, the length of the run it belongs to."""
+        return np.repeat(self.lengths, self.lengths)
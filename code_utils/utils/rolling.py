@@ -0,0 +1,123 @@
+"""Fast, NaN-aware rolling window statistics on (1D) numpy arrays.
+
+The functions in this module mimic the behavior of `pd.Series.rolling(window)`
+(i.e., `min_periods=window`): every window that contains a NaN, or that is not
+fully covered by the signal, results in a NaN output value.
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+
+def window_bounds(window: int, center: bool) -> Tuple[int, int]:
+    """Return the (left, right) offsets of a window w.r.t. its output position.
+
+    The bounds are the same as those of `pd.Series.rolling(window, center=center)`.
+
+    Parameters
+    ----------
+    window : int
+        The window size (in number of samples).
+    center : bool
+        Whether the window is centered around its output position. If False, the
+        window is trailing, i.e., it ends at its output position.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The number of samples the window spans left and right of its position.
+
+    """
+    if center:
+        return window // 2, window - 1 - window // 2
+    return window - 1, 0
+
+
+def _windowed_sum(arr: np.ndarray, window: int) -> np.ndarray:
+    """Return the sum of each complete window (length `len(arr) - window + 1`)."""
+    cumsum = np.cumsum(arr)
+    out = cumsum[window - 1 :].copy()
+    out[1:] -= cumsum[:-window]
+    return out
+
+
+def _valid_window_mask(isnan: np.ndarray, window: int, center: bool) -> np.ndarray:
+    """Return a boolean mask which is `True` where the window contains no NaNs and
+    is fully covered by the signal."""
+    n = len(isnan)
+    left, right = window_bounds(window, center)
+    valid = np.zeros(n, dtype=bool)
+    if n < window:
+        return valid
+
+    # the output positions whose window is completely within the signal
+    valid[left : n - right] = True
+    if isnan.any():
+        valid[left : n - right] = _windowed_sum(isnan.astype(np.int64), window) == 0
+    return valid
+
+
+def rolling_sum(arr: np.ndarray, window: int, center: bool = True) -> np.ndarray:
+    """Calculate the rolling sum of `arr` using a cumulative sum.
+
+    Parameters
+    ----------
+    arr : np.ndarray
+        The 1D array on which the rolling sum will be calculated. Boolean arrays are
+        also supported, resulting in the number of `True` values per window.
+    window : int
+        The window size (in number of samples).
+    center : bool, optional
+        Whether the window is centered around the output position, by default True.
+
+    Returns
+    -------
+    np.ndarray
+        A float64 array of the same length as `arr`.
+
+    """
+    arr = np.asarray(arr)
+    n = len(arr)
+    left, right = window_bounds(window, center)
+
+    out = np.full(n, np.nan)
+    if n < window:
+        return out
+
+    if arr.dtype.kind in "biu":  # boolean or integer arrays do not contain NaNs
+        out[left : n - right] = _windowed_sum(arr.astype(np.int64), window)
+        return out
+
+    arr = arr.astype(np.float64, copy=False)
+    isnan = np.isnan(arr)
+    if not isnan.any():
+        out[left : n - right] = _windowed_sum(arr, window)
+        return out
+
+    valid = _valid_window_mask(isnan, window, center)
+    out[left : n - right] = _windowed_sum(np.where(isnan, 0, arr), window)
+    out[~valid] = np.nan
+    return out
+
+
+def rolling_mean(arr: np.ndarray, window: int, center: bool = True) -> np.ndarray:
+    """Calculate the rolling mean of `arr` using a cumulative sum.
+
+    Parameters
+    ----------
+    arr : np.ndarray
+        The 1D array on which the rolling mean will be calculated.
+    window : int
+        The window size (in number of samples).
+    center : bool, optional
+        Whether the window is centered around the output position, by default True.
+
+    Returns
+    -------
+    np.ndarray
+        A float64 array of the same length as `arr`.
+
+    """
+    return rolling_sum(arr, window, center=center) / window
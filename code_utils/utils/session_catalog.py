@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""A persistent, incrementally updated catalog of wearable sessions.
+
+The catalog stores two compact parquet tables per (user, sensor):
+
+* `<catalog_dir>/<user>/<sensor>.parquet`, the session table, and
+* `<catalog_dir>/<user>/<sensor>.files.parquet`, the source (parquet) files
+  together with their modification time, size and the dates they cover.
+
+Updating the catalog only (re)computes the sessions of the dates that are covered
+by new, modified or removed files. The timestamps of all files covering such a
+date are merged (and deduplicated), hence overlapping files (e.g., the same
+recording exported to multiple folders) do not inflate the sessions. Compliance
+analyses can thus query the catalog instead of rescanning the signal data.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import pandas as pd
+
+from code_utils.utils.interaction_analysis import (
+    _get_td_range_df,
+    _merge_sorted_runs,
+    _read_sorted_timestamps,
+)
+
+_SESSION_COLS = ["date", "start", "end", "session_dur", "n_samples"]
+_FILE_COLS = ["file", "file_mtime_ns", "file_size", "date"]
+# the (explicit) dtypes of the catalog columns, the datetime columns of non-empty
+# catalogs are tz-aware (i.e., the timezone of the source data)
+_DTYPES = {
+    "file": "object",
+    "file_mtime_ns": "int64",
+    "file_size": "int64",
+    "date": "datetime64[ns]",
+    "start": "datetime64[ns]",
+    "end": "datetime64[ns]",
+    "session_dur": "timedelta64[ns]",
+    "n_samples": "int64",
+    "daily_wear_time": "timedelta64[ns]",
+}
+_INT_COLS = ["file_mtime_ns", "file_size", "n_samples"]
+
+
+def _catalog_path(catalog_dir: Union[str, Path], user: str, sensor: str) -> Path:
+    return Path(catalog_dir) / user / f"{sensor}.parquet"
+
+
+def _files_path(catalog_dir: Union[str, Path], user: str, sensor: str) -> Path:
+    return Path(catalog_dir) / user / f"{sensor}.files.parquet"
+
+
+def _empty_catalog(columns) -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=_DTYPES[c]) for c in columns})
+
+
+def _concat(frames, columns) -> pd.DataFrame:
+    # empty frames are skipped, as these would upcast the (tz-aware) columns
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return _empty_catalog(columns)
+    return pd.concat(frames, ignore_index=True)[columns].astype(
+        {c: _DTYPES[c] for c in _INT_COLS if c in columns}
+    )
+
+
+def _to_parquet_atomic(df: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    df.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, path)
+
+
+def _file_dates(t: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Return the (local) dates spanned by the sorted timestamps `t`."""
+    if not len(t):
+        return pd.DatetimeIndex([])
+    return pd.date_range(t[0].normalize(), t[-1].normalize(), freq="D")
+
+
+def _file_rows(path: Path, t: pd.DatetimeIndex) -> pd.DataFrame:
+    """Return the file table rows (i.e., one per covered date) of a single file.
+
+    Empty files have a single row with a missing `date`.
+    """
+    stat = path.stat()
+    dates = _file_dates(t)
+    rows = pd.DataFrame({"file": str(path)}, index=range(max(len(dates), 1)))
+    rows["file_mtime_ns"] = stat.st_mtime_ns
+    rows["file_size"] = stat.st_size
+    if len(dates):
+        rows["date"] = dates
+    return rows
+
+
+def _sessions(t: pd.DatetimeIndex, fs_exp: float) -> pd.DataFrame:
+    """Compute the session table (incl. the sample count) of the timestamps `t`."""
+    if not len(t):
+        return _empty_catalog(_SESSION_COLS)
+    sessions = _get_td_range_df(
+        pd.DataFrame(index=t), threshold=pd.Timedelta(seconds=1.1 / fs_exp)
+    )
+    sessions["n_samples"] = t.searchsorted(sessions["end"], side="right") - (
+        t.searchsorted(sessions["start"], side="left")
+    )
+    return sessions[_SESSION_COLS]
+
+
+def _add_daily_wear_time(sessions: pd.DataFrame) -> pd.DataFrame:
+    sessions = sessions.sort_values("start").reset_index(drop=True)
+    sessions["daily_wear_time"] = sessions.groupby("date")["session_dur"].transform(
+        "sum"
+    )
+    return sessions
+
+
+def load_session_catalog(
+    catalog_dir: Union[str, Path], user: str, sensor: str
+) -> pd.DataFrame:
+    """Load the session table of a (`user`, `sensor`) from the catalog.
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with columns [`date`, `start`, `end`, `session_dur`,
+        `n_samples`, `daily_wear_time`], sorted by `start`. An empty dataframe is
+        returned if the (`user`, `sensor`) is not (yet) cataloged.
+
+    """
+    path = _catalog_path(catalog_dir, user, sensor)
+    if not path.exists():
+        return _empty_catalog(_SESSION_COLS + ["daily_wear_time"])
+    sessions = pd.read_parquet(path, columns=_SESSION_COLS, engine="pyarrow")
+    return _add_daily_wear_time(sessions)
+
+
+def update_session_catalog(
+    catalog_dir: Union[str, Path],
+    user: str,
+    sensor: str,
+    files: Iterable[Path],
+    fs_exp: float,
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """Update the catalog of a (`user`, `sensor`) with its current source `files`.
+
+    Only the sessions of the dates which are covered by new, modified (i.e., a
+    different modification time or size) or removed files are (re)computed. The
+    sessions of such a date are computed on the merged and deduplicated timestamps
+    of all the `files` covering that date, hence the `files` may overlap in time.
+
+    Parameters
+    ----------
+    catalog_dir : Union[str, Path]
+        The root directory of the catalog.
+    user : str
+        The user identifier.
+    sensor : str
+        The sensor identifier.
+    files : Iterable[Path]
+        All the (current) parquet files of the (`user`, `sensor`), each containing
+        a `timestamp` column.
+    fs_exp : float
+        The expected sample frequency of the sensor, gaps larger than
+        `1.1 / fs_exp` seconds end a session.
+    n_jobs : int, optional
+        The number of threads used to read the timestamps of the (new, modified or
+        overlapping) files, by default None, i.e., the default number of workers of a
+        `ThreadPoolExecutor`.
+
+    Returns
+    -------
+    pd.DataFrame
+        The updated session table, see `load_session_catalog`.
+
+    """
+    path = _catalog_path(catalog_dir, user, sensor)
+    files_path = _files_path(catalog_dir, user, sensor)
+    files = {str(f): f for f in map(Path, files)}
+
+    df_cat = _empty_catalog(_SESSION_COLS)
+    df_files = _empty_catalog(_FILE_COLS)
+    # (legacy) catalogs without a file table are recomputed from scratch
+    if path.exists() and files_path.exists():
+        df_cat = pd.read_parquet(path, columns=_SESSION_COLS, engine="pyarrow")
+        df_files = pd.read_parquet(files_path, engine="pyarrow")
+
+    # determine which files are still up-to-date in the catalog
+    stats = {k: f.stat() for k, f in files.items()}
+    df_stats = df_files.drop_duplicates("file").set_index("file")
+    up_to_date = {
+        k
+        for k, st in stats.items()
+        if k in df_stats.index
+        and df_stats.at[k, "file_mtime_ns"] == st.st_mtime_ns
+        and df_stats.at[k, "file_size"] == st.st_size
+    }
+    to_update = [k for k in files if k not in up_to_date]
+    if not to_update and len(df_stats) == len(up_to_date):
+        return _add_daily_wear_time(df_cat)
+
+    def _read(keys) -> dict:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            runs = pool.map(lambda k: _read_sorted_timestamps(files[k]), keys)
+            return dict(zip(keys, runs))
+
+    # the dates of which the sessions are recomputed, i.e., the dates which were
+    # covered by the outdated / removed files or are covered by the updated files
+    runs = _read(to_update)
+    is_outdated = ~df_files["file"].isin(up_to_date)
+    dates = set(df_files.loc[is_outdated, "date"].dropna())
+    dates = list(dates.union(d for t in runs.values() for d in _file_dates(t)))
+
+    # (re)read the up-to-date files which also cover these dates
+    df_kept = df_files[~is_outdated]
+    overlapping = df_kept.loc[df_kept["date"].isin(dates), "file"].unique()
+    runs.update(_read(list(overlapping)))
+
+    t = _merge_sorted_runs(runs.values())
+    sessions = _sessions(t, fs_exp)
+    df_cat = _concat(
+        [df_cat[~df_cat["date"].isin(dates)], sessions[sessions["date"].isin(dates)]],
+        _SESSION_COLS,
+    ).sort_values("start", ignore_index=True)
+    df_files = _concat(
+        [df_kept, *(_file_rows(files[k], runs[k]) for k in to_update)], _FILE_COLS
+    )
+
+    # atomically replace the catalog files, the file table is written last so that
+    # an interrupted update is redone
+    _to_parquet_atomic(df_cat, path)
+    _to_parquet_atomic(df_files, files_path)
+    return _add_daily_wear_time(df_cat)
@@ -0,0 +1,81 @@
+"""Utilities to share (dicts of) numpy arrays between processes via shared memory.
+
+The arrays are stored back-to-back in a single `SharedMemory` block; only the
+block its name and a small `layout` dict (array name -> (dtype, shape, offset))
+need to be passed to other processes.
+"""
+from __future__ import annotations
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Tuple
+
+import numpy as np
+
+# The byte alignment of the arrays within the shared memory block
+_ALIGNMENT = 64
+
+
+def to_shared_memory(
+    arrays: Dict[str, np.ndarray]
+) -> Tuple[SharedMemory, Dict[str, tuple]]:
+    """Copy the given `arrays` into a newly created shared memory block.
+
+    Note
+    ----
+    The caller is responsible for calling `close()` and `unlink()` on the returned
+    shared memory block once it is no longer needed.
+
+    Parameters
+    ----------
+    arrays : Dict[str, np.ndarray]
+        The (non-object dtype) arrays which will be stored in shared memory.
+
+    Returns
+    -------
+    Tuple[SharedMemory, Dict[str, tuple]]
+        The shared memory block and its layout, i.e., a dict with keys the array
+        names and values a (dtype-str, shape, byte-offset) tuple.
+
+    """
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        if arr.dtype.hasobject:
+            raise ValueError(f"array {name} has an object dtype ({arr.dtype})")
+        layout[name] = (arr.dtype.str, arr.shape, offset)
+        offset += -(-arr.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    for name, arr in arrays.items():
+        dtype, shape, offset = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = arr
+    return shm, layout
+
+
+def from_shared_memory(
+    shm: SharedMemory, layout: Dict[str, tuple], copy: bool = True
+) -> Dict[str, np.ndarray]:
+    """Obtain the arrays which are stored in the shared memory block `shm`.
+
+    Parameters
+    ----------
+    shm : SharedMemory
+        The (attached) shared memory block.
+    layout : Dict[str, tuple]
+        The layout of the block, as returned by `to_shared_memory`.
+    copy : bool, optional
+        Whether the arrays are copied, by default True. If False, the arrays are
+        views on the shared memory buffer, which must be released (i.e., deleted)
+        before the block is closed.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        A dict with keys the array names and values the arrays.
+
+    """
+    arrays = {}
+    for name, (dtype, shape, offset) in layout.items():
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        arrays[name] = arr.copy() if copy else arr
+    return arrays
@@ -3,32 +3,40 @@
 
 __author__ = "Jonas Van Der Donckt"
 
+import json
 import os
 import platform
+import re
 import shutil
 import subprocess
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 
 
-def rolling_window(a: np.ndarray, window: int) -> np.ndarray:
-    """Expand an n-dimensional array into windows of size `window`.
+def rolling_window(a: np.ndarray, window: int, step: int = 1) -> np.ndarray:
+    """Expand an n-dimensional array into windows of size `window` along its last
+    axis.
 
-    .. TODO::
-        investigate the code behavior on n-dimensional arrays, with n > 1
-
-    .. TODO::
-        If necessary -> stride can be used
+    The output is a (read-only) zero-copy view on `a`, with shape
+    ``a.shape[:-1] + (n_windows, window)``, where
+    ``n_windows = (a.shape[-1] - window) // step + 1``.
 
     :param a: The array which will be expanded
     :param window: The size of the window
+    :param step: The step (i.e., stride in samples) between consecutive windows
     :return: The expanded array
     """
-    shape = a.shape[:-1] + (a.shape[-1] - window + 1, window)
-    strides = a.strides + (a.strides[-1],)
-    return np.lib.stride_tricks.as_strided(a, shape=shape, strides=strides)
+    assert window >= 1 and step >= 1
+    n_windows = max(0, (a.shape[-1] - window) // step + 1)
+    shape = a.shape[:-1] + (n_windows, window)
+    strides = a.strides[:-1] + (a.strides[-1] * step, a.strides[-1])
+    return np.lib.stride_tricks.as_strided(
+        a, shape=shape, strides=strides, writeable=False
+    )
 
 
 def kth_diag_indices(a: np.ndarray, k: int):
@@ -100,14 +108,74 @@ def get_last_modified(file_path: Union[str, Path]) -> float:
     return stat.st_mtime
 
 
+def find_7z_binary() -> str:
+    """Return the path of the `7z` (or `7za`) binary.
+
+    Raises
+    ------
+    FileNotFoundError
+        If neither the `7z` nor the `7za` binary could be found on the PATH.
+
+    """
+    bin_7z = shutil.which("7z") or shutil.which("7za")
+    if bin_7z is None:
+        raise FileNotFoundError("the 7z (or 7za) binary is required for .7z files")
+    return bin_7z
+
+
+def _extract_archive(archive: Path, output_dir: Path) -> Optional[int]:
+    """Extract a `.zip` or `.7z` archive into `output_dir`.
+
+    Returns
+    -------
+    Optional[int]
+        The number of extracted files, None if 7z did not report it.
+
+    """
+    if archive.suffix.lower() == ".7z":
+        out = subprocess.run(
+            [find_7z_binary(), "x", "-y", f"-o{output_dir}", str(archive)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        # 7z does not report the file count for (e.g.) single-file archives, in
+        # which case the count is unknown
+        n_files = re.search(r"^Files: (\d+)", out, flags=re.MULTILINE)
+        return int(n_files.group(1)) if n_files else None
+
+    subprocess.run(
+        ["unzip", "-o", "-q", str(archive), "-d", str(output_dir)], check=True
+    )
+    with zipfile.ZipFile(archive) as zf:
+        return sum(not info.is_dir() for info in zf.infolist())
+
+
+def _write_manifest(manifest: dict, manifest_path: Path):
+    """Durably (i.e., atomically & synced) write the `manifest` as json."""
+    tmp_path = manifest_path.with_suffix(manifest_path.suffix + ".tmp")
+    with open(tmp_path, mode="w") as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
 def unzip_inplace(
-    root_dir: Path, recursive=True, prev_matches: List[str] = None
+    root_dir: Path,
+    recursive=True,
+    prev_matches: List[str] = None,
+    n_jobs: int = 1,
+    manifest_path: Optional[Union[str, Path]] = None,
+    archive_types: Tuple[str, ...] = ("zip",),
+    output_dir: Optional[Path] = None,
 ) -> List[str]:
-    """Unzip the `.zip` files in `root_dir`.
+    """Unzip the `.zip` (and/or `.7z`) files in `root_dir`.
 
     Note
     ----
-    Will use a case insensitive regex-match on the `.zip` extension
+    Will use a case insensitive regex-match on the archive extensions.
+    `.zip` files are extracted with `unzip`, `.7z` files with the `7z` binary.
 
     Parameters
     ----------
@@ -118,30 +186,96 @@ def unzip_inplace(
         in the `root_dir` will be outputted, by default True
     prev_matches : List[str], optional
         A list of previous matches, by default None
+    n_jobs : int, optional
+        The number of archives that are extracted in parallel, by default 1.
+    manifest_path : Union[str, Path], optional
+        The path of a json manifest which records, for each extracted (archive,
+        output directory), the archive its size, modification time and number of
+        extracted files (None if unknown). The manifest is (durably) updated after
+        each extracted archive and is checked on restart, i.e., archives whose size
+        & modification time match their manifest entry (for the same output
+        directory) are skipped. By default None, i.e., no manifest is used.
+    archive_types : Tuple[str, ...], optional
+        The archive extensions which are extracted, by default ("zip",). Pass e.g.
+        ("zip", "7z") to also extract the `.7z` archives (e.g., of ETRI).
+    output_dir : Path, optional
+        The directory in which the archives are extracted, by default None, i.e.,
+        each archive is extracted in its own parent directory.
 
     Returns
     -------
     List[str]
         The list of already unzipped files (=prev matches + newly unzipped mathes).
 
+    Raises
+    ------
+    Exception
+        The (first) error of the archives which could not be extracted. This is
+        raised after all other archives are extracted (and recorded in the
+        manifest).
+
     """
     assert root_dir.is_dir()
     prev_matches = [] if not isinstance(prev_matches, list) else prev_matches.copy()
 
-    if recursive:
-        matches = list(root_dir.rglob("*.[zZ][iI][pP]"))
-    else:
-        matches = list(root_dir.glob("*.[zZ][iI][pP]"))
-
-    zip_file: Path
-    for zip_file in matches:
-        if str(zip_file) in prev_matches:
-            print(f"file {zip_file} already unzipped")
+    manifest = {}
+    if manifest_path is not None:
+        manifest_path = Path(manifest_path)
+        if manifest_path.is_file():
+            with open(manifest_path, mode="r") as f:
+                manifest = json.load(f)
+
+    glob = root_dir.rglob if recursive else root_dir.glob
+    matches: List[Path] = []
+    for ext in archive_types:
+        ext_pattern = "".join(f"[{c.lower()}{c.upper()}]" for c in ext)
+        matches.extend(sorted(glob(f"*.{ext_pattern}")))
+
+    def _manifest_key(archive: Path) -> str:
+        return f"{archive} -> {output_dir or archive.parent}"
+
+    to_extract: List[Path] = []
+    for archive in matches:
+        stat, entry = archive.stat(), manifest.get(_manifest_key(archive), {})
+        in_manifest = (entry.get("size"), entry.get("mtime")) == (
+            stat.st_size,
+            stat.st_mtime,
+        )
+        if str(archive) in prev_matches or in_manifest:
+            print(f"file {archive} already unzipped")
+            if str(archive) not in prev_matches:
+                prev_matches.append(str(archive))
             continue
-
-        print(f"unzipping {zip_file}")
-        subprocess.run(f"unzip -o {zip_file} -d {zip_file.parent}".split())
-        prev_matches.append(str(zip_file))
+        to_extract.append(archive)
+
+    def _extract(archive: Path) -> Tuple[Path, os.stat_result, Optional[int]]:
+        print(f"unzipping {archive}")
+        # stat prior to extracting, so that a concurrently modified archive is
+        # extracted again on restart
+        stat = archive.stat()
+        return archive, stat, _extract_archive(archive, output_dir or archive.parent)
+
+    errors: List[Exception] = []
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        futures = {pool.submit(_extract, a): a for a in to_extract}
+        for future in as_completed(futures):
+            try:
+                archive, stat, n_files = future.result()
+            except Exception as e:
+                # continue with the other archives, the error is raised at the end
+                print(f"failed to unzip {futures[future]}: {e!r}")
+                errors.append(e)
+                continue
+            prev_matches.append(str(archive))
+            if manifest_path is not None:
+                manifest[_manifest_key(archive)] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "n_files": n_files,
+                }
+                _write_manifest(manifest, manifest_path)
+    if errors:
+        raise errors[0]
     return prev_matches
 
 
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Strided window-view feature extraction on (multi-channel) numpy arrays.
+
+The windows are zero-copy views (see `code_utils.utils.util.rolling_window`) on the
+signal, on which the reductions are computed in batched numpy, avoiding the
+overhead of `pd.Series.rolling`.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from code_utils.utils.rolling import window_bounds
+from code_utils.utils.util import rolling_window
+
+
+def _zero_crossings(w: np.ndarray) -> np.ndarray:
+    out = np.count_nonzero(np.diff(np.signbit(w), axis=-1), axis=-1).astype(float)
+    out[np.isnan(w).any(axis=-1)] = np.nan
+    return out
+
+
+# The supported reductions, each reducing the last (i.e., window) axis with the
+# given delta degrees of freedom (only used by the std)
+_REDUCTIONS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    "mean": lambda w, ddof: w.mean(axis=-1),
+    "std": lambda w, ddof: w.std(axis=-1, ddof=ddof),
+    "min": lambda w, ddof: w.min(axis=-1),
+    "max": lambda w, ddof: w.max(axis=-1),
+    "zero_crossings": lambda w, ddof: _zero_crossings(w),
+}
+# The column prefix of unnamed series
+_DEFAULT_NAME = "value"
+
+
+def window_view(
+    arr: np.ndarray,
+    window: int,
+    step: int = 1,
+    center: bool = False,
+    pad: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Create a strided window view on `arr`, whose first axis is the time axis.
+
+    Parameters
+    ----------
+    arr : np.ndarray
+        The (n_samples,) or multi-channel (n_samples, ...) array.
+    window : int
+        The window size (in number of samples).
+    step : int, optional
+        The step (in number of samples) between consecutive windows, by default 1.
+    center : bool, optional
+        Whether the windows are centered around their (output) position, by default
+        False, i.e., the windows are trailing and end at their position. The
+        window bounds are the same as those of `pd.Series.rolling(window, center)`.
+    pad : bool, optional
+        If True (default), a window is created at every `step`-th sample, where the
+        windows that exceed the signal bounds are NaN padded (hence, their
+        reductions are NaN). This requires a (float) copy of `arr`.
+        If False, only the windows which lie completely within the signal are
+        created, and the view is zero-copy.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The (read-only) window view, with shape (n_windows, ..., window), and the
+        sample position (i.e., index in `arr`) to which each window is aligned.
+
+    """
+    arr = np.asarray(arr)
+    n = arr.shape[0]
+    left, right = window_bounds(window, center)
+
+    if pad:
+        arr = np.asarray(arr, dtype=np.result_type(arr.dtype, np.float32))
+        pad_width = [(left, right)] + [(0, 0)] * (arr.ndim - 1)
+        arr = np.pad(arr, pad_width, mode="constant", constant_values=np.nan)
+        positions = np.arange(0, n, step)
+    else:
+        positions = np.arange(left, n - right, step)
+
+    # move the time axis to the end (still a view) to create the windows
+    windows = rolling_window(np.moveaxis(arr, 0, -1), window, step)
+    return np.moveaxis(windows, -2, 0), positions
+
+
+def window_features(
+    data: Union[np.ndarray, pd.Series, pd.DataFrame],
+    window: int,
+    step: int = 1,
+    center: bool = False,
+    pad: bool = True,
+    features: Iterable[str] = ("mean", "std", "min", "max"),
+    quantiles: Iterable[float] = (),
+    ddof: int = 1,
+    batch_size: Optional[int] = 100_000,
+) -> Union[Dict[str, np.ndarray], pd.DataFrame]:
+    """Compute window features on the strided window view of `data`.
+
+    Note
+    ----
+    The reductions cost O(n_windows * window), hence this is intended for strided
+    (i.e., `step` > 1) feature extraction. For step-1 rolling statistics on long
+    signals, the cumsum based `code_utils.utils.rolling` functions are preferable.
+    A single strided mean / std / var is computed faster by the (online)
+    `pd.Series.rolling(window, step=step)`; this function pays off when several
+    features, quantiles or zero-crossings are extracted from the same windows.
+
+    Parameters
+    ----------
+    data : Union[np.ndarray, pd.Series, pd.DataFrame]
+        The (multi-channel) signal, with the time axis as first axis.
+    window : int
+        The window size (in number of samples).
+    step : int, optional
+        The step (in number of samples) between consecutive windows, by default 1.
+    center : bool, optional
+        Whether the windows are centered around their position, by default False.
+    pad : bool, optional
+        Whether windows exceeding the signal bounds are (NaN) padded, by default
+        True. See `window_view`.
+    features : Iterable[str], optional
+        The reductions which are computed, a subset of "mean", "std", "min",
+        "max" and "zero_crossings". By default ("mean", "std", "min", "max").
+    quantiles : Iterable[float], optional
+        The quantiles (in [0, 1], linearly interpolated) which are computed, by
+        default ().
+    ddof : int, optional
+        The delta degrees of freedom of the "std" feature, by default 1, i.e., the
+        sample standard deviation (as computed by `pd.Series.rolling().std()`).
+    batch_size : int, optional
+        The number of windows that are reduced at once, which bounds the size of
+        the intermediate arrays, by default 100_000. If None, all windows are
+        reduced at once.
+
+    Returns
+    -------
+    Union[Dict[str, np.ndarray], pd.DataFrame]
+        If `data` is a numpy array, a dict with the feature names (e.g., "mean",
+        "q_0.5") as keys and (n_windows, ...) arrays as values.
+        If `data` is a pandas object, a dataframe indexed by the window positions
+        with `<column>__<feature>` columns, where unnamed series use "value" as
+        column prefix.
+
+    """
+    features = list(features)
+    unknown = set(features) - set(_REDUCTIONS)
+    assert not unknown, f"unsupported features: {unknown}"
+    quantiles = list(quantiles)
+
+    windows, positions = window_view(
+        np.asarray(data), window, step=step, center=center, pad=pad
+    )
+
+    def _reduce(w: np.ndarray) -> Dict[str, np.ndarray]:
+        out = {f: _REDUCTIONS[f](w, ddof) for f in features}
+        if quantiles:
+            q_values = np.quantile(w, quantiles, axis=-1)
+            out.update({f"q_{q}": v for q, v in zip(quantiles, q_values)})
+        return out
+
+    batch_size = batch_size or max(1, len(windows))
+    batches = [
+        _reduce(windows[i : i + batch_size]) for i in range(0, len(windows), batch_size)
+    ]
+    if batches:
+        results = {k: np.concatenate([b[k] for b in batches]) for k in batches[0]}
+    else:
+        results = _reduce(windows)
+
+    if not isinstance(data, (pd.Series, pd.DataFrame)):
+        return results
+
+    index = data.index[positions]
+    if isinstance(data, pd.Series):
+        name = _DEFAULT_NAME if data.name is None else data.name
+        return pd.DataFrame(
+            {f"{name}__{k}": v for k, v in results.items()}, index=index
+        )
+    return pd.DataFrame(
+        {
+            f"{col}__{k}": v[:, i]
+            for k, v in results.items()
+            for i, col in enumerate(data.columns)
+        },
+        index=index,
+    )